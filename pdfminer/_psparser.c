@@ -0,0 +1,396 @@
+/*
+ *  _psparser.c - compiled version of psparser.scan_tokens().
+ *
+ *  This module is optional. When it is not built, pdfminer.psparser
+ *  falls back to the pure-Python scan_tokens(). Both produce exactly
+ *  the same tokens; see TestPSBaseParser.test_5 in psparser.py.
+ */
+#include <Python.h>
+
+/* Objects taken from pdfminer.psparser by setup(). */
+static PyObject *kwd_func = NULL;
+static PyObject *lit_func = NULL;
+static PyObject *dict_begin = NULL;
+static PyObject *dict_end = NULL;
+static PyObject *psparser_module = NULL;
+
+/* \s in a Python 2 byte regex. */
+#define IS_SPACE(c) ((c) == ' ' || (c) == '\t' || (c) == '\n' || \
+                     (c) == '\r' || (c) == '\f' || (c) == '\v')
+#define IS_DIGIT(c) ('0' <= (c) && (c) <= '9')
+#define IS_ALPHA(c) (('a' <= (c) && (c) <= 'z') || ('A' <= (c) && (c) <= 'Z'))
+#define IS_HEX(c) (IS_DIGIT(c) || ('a' <= (c) && (c) <= 'f') || ('A' <= (c) && (c) <= 'F'))
+/* END_LITERAL and END_KEYWORD. */
+#define IS_END_NAME(c) (IS_SPACE(c) || (c) == '#' || (c) == '/' || (c) == '%' || \
+                        (c) == '[' || (c) == ']' || (c) == '(' || (c) == ')' || \
+                        (c) == '<' || (c) == '>' || (c) == '{' || (c) == '}')
+
+static int
+hexval(char c)
+{
+    if (IS_DIGIT(c)) return c - '0';
+    if ('a' <= c && c <= 'f') return c - 'a' + 10;
+    return c - 'A' + 10;
+}
+
+/* Appends (pos, obj) to the token queue. Steals a reference to obj. */
+static int
+add_token(PyObject *append, Py_ssize_t pos, PyObject *obj)
+{
+    PyObject *t, *r;
+    if (obj == NULL) return -1;
+    t = Py_BuildValue("(nN)", pos, obj);
+    if (t == NULL) return -1;
+    r = PyObject_CallFunctionObjArgs(append, t, NULL);
+    Py_DECREF(t);
+    if (r == NULL) return -1;
+    Py_DECREF(r);
+    return 0;
+}
+
+static PyObject *
+intern_name(PyObject *func, const char *s, Py_ssize_t len)
+{
+    PyObject *name = PyString_FromStringAndSize(s, len);
+    PyObject *obj;
+    if (name == NULL) return NULL;
+    obj = PyObject_CallFunctionObjArgs(func, name, NULL);
+    Py_DECREF(name);
+    return obj;
+}
+
+/* Converts a number token just like int() or float() does.
+   Returns NULL without an exception set when it is not a number. */
+static PyObject *
+make_number(const char *s, Py_ssize_t len, int isfloat)
+{
+    PyObject *str, *obj;
+    Py_ssize_t k = (0 < len && (s[0] == '-' || s[0] == '+'));
+    /* up to 9 digits always fit in a C long. */
+    if (!isfloat && len-k <= 9) {
+        long v = 0;
+        int neg = (k && s[0] == '-');
+        if (k == len) return NULL;
+        for (; k < len; k++) {
+            v = v*10 + (s[k] - '0');
+        }
+        return PyInt_FromLong(neg ? -v : v);
+    }
+    str = PyString_FromStringAndSize(s, len);
+    if (str == NULL) return NULL;
+    if (isfloat) {
+        obj = PyObject_CallFunctionObjArgs((PyObject *)&PyFloat_Type, str, NULL);
+    } else {
+        obj = PyObject_CallFunctionObjArgs((PyObject *)&PyInt_Type, str, NULL);
+    }
+    Py_DECREF(str);
+    if (obj == NULL && PyErr_ExceptionMatches(PyExc_ValueError)) {
+        PyErr_Clear();
+    }
+    return obj;
+}
+
+static PyObject *
+make_literal(const char *s, Py_ssize_t len)
+{
+    PyObject *name, *u, *obj;
+    char *p;
+    Py_ssize_t k = 0;
+    name = PyString_FromStringAndSize(NULL, len);
+    if (name == NULL) return NULL;
+    p = PyString_AS_STRING(name);
+    while (k < len) {
+        if (s[k] == '#') {
+            int v = 0, m = 0;
+            k++;
+            while (m < 2 && k < len && IS_HEX(s[k])) {
+                v = v*16 + hexval(s[k]);
+                k++;
+                m++;
+            }
+            if (m) *p++ = (char)v;
+        } else {
+            *p++ = s[k++];
+        }
+    }
+    if (_PyString_Resize(&name, p - PyString_AS_STRING(name)) < 0) return NULL;
+    u = PyUnicode_DecodeUTF8(PyString_AS_STRING(name), PyString_GET_SIZE(name), "strict");
+    Py_DECREF(name);
+    if (u == NULL) {
+        PyObject *strict;
+        int isstrict;
+        if (!PyErr_ExceptionMatches(PyExc_UnicodeDecodeError)) return NULL;
+        strict = PyObject_GetAttrString(psparser_module, "STRICT");
+        if (strict == NULL) return NULL;
+        isstrict = PyObject_IsTrue(strict);
+        Py_DECREF(strict);
+        if (isstrict) return NULL;
+        PyErr_Clear();
+        u = PyString_FromString("");
+        if (u == NULL) return NULL;
+    }
+    obj = PyObject_CallFunctionObjArgs(lit_func, u, NULL);
+    Py_DECREF(u);
+    return obj;
+}
+
+static PyObject *
+make_hexstring(const char *s, Py_ssize_t len)
+{
+    PyObject *obj;
+    char *p;
+    Py_ssize_t k;
+    int v = 0, m = 0;
+    obj = PyString_FromStringAndSize(NULL, (len+1)/2);
+    if (obj == NULL) return NULL;
+    p = PyString_AS_STRING(obj);
+    for (k = 0; k < len; k++) {
+        if (IS_SPACE(s[k])) continue;
+        v = v*16 + hexval(s[k]);
+        if (++m == 2) {
+            *p++ = (char)v;
+            v = m = 0;
+        }
+    }
+    if (m) *p++ = (char)v;
+    if (_PyString_Resize(&obj, p - PyString_AS_STRING(obj)) < 0) return NULL;
+    return obj;
+}
+
+PyDoc_STRVAR(scan_tokens_doc,
+"scan_tokens(s, i, bufpos, tokens) -> int\n\
+\n\
+Compiled version of pdfminer.psparser.scan_tokens().");
+
+static PyObject *
+scan_tokens(PyObject *self, PyObject *args)
+{
+    PyObject *src, *tokens, *append;
+    const char *c;
+    Py_ssize_t n, i, bufpos, j, k;
+
+    if (!PyArg_ParseTuple(args, "OnnO:scan_tokens", &src, &i, &bufpos, &tokens)) {
+        return NULL;
+    }
+    if (kwd_func == NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "setup() has not been called");
+        return NULL;
+    }
+    if (PyObject_AsReadBuffer(src, (const void **)&c, &n) < 0) {
+        return NULL;
+    }
+    append = PyObject_GetAttrString(tokens, "append");
+    if (append == NULL) return NULL;
+
+    while (1) {
+        /* skip spaces and terminated comments. */
+        j = i;
+        while (1) {
+            while (j < n && IS_SPACE(c[j])) j++;
+            if (j < n && c[j] == '%') {
+                k = j+1;
+                while (k < n && c[k] != '\r' && c[k] != '\n') k++;
+                if (k == n) break;
+                j = k;
+                continue;
+            }
+            break;
+        }
+        if (n <= j) {
+            i = j;
+            goto done;
+        }
+        switch (c[j]) {
+        case '%':
+            /* unterminated comment. */
+            i = j;
+            goto done;
+
+        case '/':
+            k = j+1;
+            while (k < n) {
+                if (c[k] == '#') {
+                    k++;
+                    if (k < n && IS_HEX(c[k])) k++;
+                    if (k < n && IS_HEX(c[k])) k++;
+                } else if (IS_END_NAME(c[k])) {
+                    break;
+                } else {
+                    k++;
+                }
+            }
+            if (k == n) {
+                i = j;
+                goto done;
+            }
+            if (add_token(append, bufpos+j, make_literal(c+j+1, k-j-1)) < 0) goto error;
+            i = k;
+            break;
+
+        case '(':
+            k = j+1;
+            while (k < n && c[k] != '(' && c[k] != ')' && c[k] != '\\') k++;
+            if (n <= k || c[k] != ')') {
+                /* leave it to the state machine. */
+                i = j;
+                goto done;
+            }
+            if (add_token(append, bufpos+j, PyString_FromStringAndSize(c+j+1, k-j-1)) < 0) goto error;
+            i = k+1;
+            break;
+
+        case '<':
+            if (j+1 < n && c[j+1] == '<') {
+                Py_INCREF(dict_begin);
+                if (add_token(append, bufpos+j, dict_begin) < 0) goto error;
+                i = j+2;
+                break;
+            }
+            k = j+1;
+            while (k < n && (IS_HEX(c[k]) || IS_SPACE(c[k]))) k++;
+            if (k == n) {
+                i = j;
+                goto done;
+            }
+            if (add_token(append, bufpos+j, make_hexstring(c+j+1, k-j-1)) < 0) goto error;
+            i = k;
+            break;
+
+        case '>':
+            if (j+1 < n && c[j+1] == '>') {
+                Py_INCREF(dict_end);
+                if (add_token(append, bufpos+j, dict_end) < 0) goto error;
+                i = j+2;
+                break;
+            }
+            if (j+1 == n) {
+                i = j;
+                goto done;
+            }
+            /* a lone '>' is ignored. */
+            i = j+1;
+            break;
+
+        case '+': case '-': case '.':
+        case '0': case '1': case '2': case '3': case '4':
+        case '5': case '6': case '7': case '8': case '9':
+        {
+            int isfloat = 0;
+            PyObject *obj;
+            k = j+1;
+            if (c[j] == '.') {
+                isfloat = 1;
+            } else {
+                while (k < n && IS_DIGIT(c[k])) k++;
+                if (k < n && c[k] == '.') {
+                    isfloat = 1;
+                    k++;
+                }
+            }
+            if (isfloat) {
+                while (k < n && IS_DIGIT(c[k])) k++;
+            }
+            if (k == n) {
+                i = j;
+                goto done;
+            }
+            obj = make_number(c+j, k-j, isfloat);
+            if (obj != NULL) {
+                if (add_token(append, bufpos+j, obj) < 0) goto error;
+            } else if (PyErr_Occurred()) {
+                goto error;
+            }
+            i = k;
+            break;
+        }
+
+        default:
+            if (IS_ALPHA(c[j])) {
+                PyObject *obj;
+                k = j+1;
+                while (k < n && !IS_END_NAME(c[k])) k++;
+                if (k == n) {
+                    i = j;
+                    goto done;
+                }
+                if (k-j == 4 && memcmp(c+j, "true", 4) == 0) {
+                    Py_INCREF(Py_True);
+                    if (add_token(append, bufpos+j, Py_True) < 0) goto error;
+                    i = k;
+                    break;
+                }
+                if (k-j == 5 && memcmp(c+j, "false", 5) == 0) {
+                    Py_INCREF(Py_False);
+                    if (add_token(append, bufpos+j, Py_False) < 0) goto error;
+                    i = k;
+                    break;
+                }
+                obj = intern_name(kwd_func, c+j, k-j);
+                if (add_token(append, bufpos+j, obj) < 0) goto error;
+                i = k;
+                goto done;
+            } else {
+                char ch = c[j];
+                if (add_token(append, bufpos+j, intern_name(kwd_func, c+j, 1)) < 0) goto error;
+                i = j+1;
+                if (ch != '[' && ch != ']' && ch != '{' && ch != '}') goto done;
+            }
+            break;
+        }
+    }
+
+done:
+    Py_DECREF(append);
+    return PyInt_FromSsize_t(i);
+
+error:
+    Py_DECREF(append);
+    return NULL;
+}
+
+PyDoc_STRVAR(setup_doc,
+"setup(module)\n\
+\n\
+Takes KWD, LIT and the dictionary keywords from the given\n\
+pdfminer.psparser module.");
+
+static PyObject *
+setup(PyObject *self, PyObject *module)
+{
+    PyObject *kwd, *lit, *begin, *end;
+    kwd = PyObject_GetAttrString(module, "KWD");
+    lit = PyObject_GetAttrString(module, "LIT");
+    begin = PyObject_GetAttrString(module, "KEYWORD_DICT_BEGIN");
+    end = PyObject_GetAttrString(module, "KEYWORD_DICT_END");
+    if (kwd == NULL || lit == NULL || begin == NULL || end == NULL) {
+        Py_XDECREF(kwd);
+        Py_XDECREF(lit);
+        Py_XDECREF(begin);
+        Py_XDECREF(end);
+        return NULL;
+    }
+    Py_XDECREF(kwd_func);
+    Py_XDECREF(lit_func);
+    Py_XDECREF(dict_begin);
+    Py_XDECREF(dict_end);
+    Py_XDECREF(psparser_module);
+    kwd_func = kwd;
+    lit_func = lit;
+    dict_begin = begin;
+    dict_end = end;
+    Py_INCREF(module);
+    psparser_module = module;
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef methods[] = {
+    {"scan_tokens", scan_tokens, METH_VARARGS, scan_tokens_doc},
+    {"setup", setup, METH_O, setup_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+PyMODINIT_FUNC
+init_psparser(void)
+{
+    Py_InitModule3("_psparser", methods, "Compiled tokenizer for pdfminer.psparser.");
+}
@@ -29,25 +29,36 @@ def ascii85decode(data):
     >>> ascii85decode(b'E,9)oF*2M7/c~>')
     'pleasure.'
     """
+    return b''.join(iter_ascii85decode([data]))
+
+
+def iter_ascii85decode(chunks):
+    """Decodes ASCII85 data given as an iterator of strings.
+
+    The decoded data is yielded as it goes.
+    """
     n = b = 0
-    out = b''
-    for c in data:
-        if b'!' <= c and c <= b'u':
-            n += 1
-            b = b*85+(ord(c)-33)
-            if n == 5:
-                out += struct.pack('>L', b)
-                n = b = 0
-        elif c == b'z':
-            assert n == 0
-            out += b'\0\0\0\0'
-        elif c == b'~':
-            if n:
-                for _ in range(5-n):
-                    b = b*85+84
-                out += struct.pack('>L', b)[:n-1]
-            break
-    return out
+    for data in chunks:
+        out = []
+        for c in data:
+            if b'!' <= c and c <= b'u':
+                n += 1
+                b = b*85+(ord(c)-33)
+                if n == 5:
+                    out.append(struct.pack('>L', b))
+                    n = b = 0
+            elif c == b'z':
+                assert n == 0
+                out.append(b'\0\0\0\0')
+            elif c == b'~':
+                if n:
+                    for _ in range(5-n):
+                        b = b*85+84
+                    out.append(struct.pack('>L', b)[:n-1])
+                yield b''.join(out)
+                return
+        yield b''.join(out)
+    return
 
 # asciihexdecode(data)
 hex_re = re.compile(r'([a-f\d]{2})', re.IGNORECASE)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import logging
 import re
+from collections import OrderedDict
 from .pdfdevice import PDFTextDevice
 from .pdffont import PDFUnicodeNotDefined
 from .layout import LTContainer
@@ -26,11 +27,22 @@ from .utils import bbox2str
 ##
 class PDFLayoutAnalyzer(PDFTextDevice):
 
+    # When cache_figures is set, the layout of a form is kept and
+    # reused when the form is drawn again with the same resources,
+    # the same scaling and rotation and in the same text and graphic
+    # states (line width, dash, colors, character spacing, etc.).
+    # Only its position may differ. Up to max_figures layouts are kept.
+    cache_figures = False
+    max_figures = 1000
+
     def __init__(self, rsrcmgr, pageno=1, laparams=None):
         PDFTextDevice.__init__(self, rsrcmgr)
         self.pageno = pageno
         self.laparams = laparams
         self._stack = []
+        self._figures = OrderedDict()
+        self._figure_key = None
+        self._figure_keys = []
         return
 
     def begin_page(self, page, ctm):
@@ -52,6 +64,8 @@ class PDFLayoutAnalyzer(PDFTextDevice):
 
     def begin_figure(self, name, bbox, matrix):
         self._stack.append(self.cur_item)
+        self._figure_keys.append(self._figure_key)
+        self._figure_key = None
         self.cur_item = LTFigure(name, bbox, mult_matrix(matrix, self.ctm))
         return
 
@@ -60,7 +74,31 @@ class PDFLayoutAnalyzer(PDFTextDevice):
         assert isinstance(self.cur_item, LTFigure)
         self.cur_item = self._stack.pop()
         self.cur_item.add(fig)
-        return
+        key = self._figure_keys.pop()
+        if key is not None:
+            # keep a copy, as the figure is changed by the analysis.
+            (key, resources) = key
+            self._figures[key] = (resources, fig.translated(0, 0))
+            if self.max_figures < len(self._figures):
+                self._figures.popitem(last=False)
+        return
+
+    def reuse_figure(self, name, bbox, matrix, form, resources, state):
+        if not self.cache_figures or form.objid is None:
+            return False
+        (a, b, c, d, e, f) = mult_matrix(matrix, self.ctm)
+        key = (form.objid, form.genno, a, b, c, d, state)
+        entry = self._figures.pop(key, None)
+        if entry is None or entry[0] is not resources:
+            self._figure_key = (key, resources)
+            return False
+        self._figures[key] = entry
+        fig = entry[1]
+        (_, _, _, _, e0, f0) = fig.matrix
+        fig = fig.translated(e-e0, f-f0)
+        fig.name = name
+        self.cur_item.add(fig)
+        return True
 
     def render_image(self, name, stream):
         assert isinstance(self.cur_item, LTFigure)
@@ -160,6 +198,10 @@ class TextConverter(PDFConverter):
         PDFConverter.__init__(self, rsrcmgr, outfp, codec=codec, pageno=pageno, laparams=laparams)
         self.showpageno = showpageno
         self.imagewriter = imagewriter
+        if imagewriter is None:
+            self.capabilities = ('text',)
+        else:
+            self.capabilities = ('text', 'image')
         return
 
     def write_text(self, text):
@@ -95,28 +95,23 @@ class ImageWriter(object):
                 fp.write(raw_data)
         elif image.bits == 1:
             bmp = BMPWriter(fp, 1, width, height)
-            data = stream.get_data()
-            i = 0
+            reader = stream.open(window=0)
             width = (width+7)//8
             for y in xrange(height):
-                bmp.write_line(y, data[i:i+width])
-                i += width
+                bmp.write_line(y, reader.read(width))
         elif image.bits == 8 and image.colorspace is LITERAL_DEVICE_RGB:
             bmp = BMPWriter(fp, 24, width, height)
-            data = stream.get_data()
-            i = 0
+            reader = stream.open(window=0)
             width = width*3
             for y in xrange(height):
-                bmp.write_line(y, data[i:i+width])
-                i += width
+                bmp.write_line(y, reader.read(width))
         elif image.bits == 8 and image.colorspace is LITERAL_DEVICE_GRAY:
             bmp = BMPWriter(fp, 8, width, height)
-            data = stream.get_data()
-            i = 0
+            reader = stream.open(window=0)
             for y in xrange(height):
-                bmp.write_line(y, data[i:i+width])
-                i += width
+                bmp.write_line(y, reader.read(width))
         else:
-            fp.write(stream.get_data())
+            for data in stream.iter_data():
+                fp.write(data)
         fp.close()
         return name
@@ -109,6 +109,14 @@ class LTComponent(LTItem):
         self.bbox = bbox
         return
 
+    def translated(self, dx, dy):
+        """Returns a copy of this object moved by (dx, dy)."""
+        obj = object.__new__(self.__class__)
+        obj.__dict__.update(self.__dict__)
+        (x0, y0, x1, y1) = self.bbox
+        obj.set_bbox((x0+dx, y0+dy, x1+dx, y1+dy))
+        return obj
+
     def is_empty(self):
         return self.width <= 0 or self.height <= 0
 
@@ -162,6 +170,11 @@ class LTCurve(LTComponent):
     def get_pts(self):
         return ','.join('%.3f,%.3f' % p for p in self.pts)
 
+    def translated(self, dx, dy):
+        obj = LTComponent.translated(self, dx, dy)
+        obj.pts = [(x+dx, y+dy) for (x, y) in self.pts]
+        return obj
+
 
 ##  LTLine
 ##
@@ -273,6 +286,12 @@ class LTChar(LTComponent, LTText):
     def get_text(self):
         return self._text
 
+    def translated(self, dx, dy):
+        obj = LTComponent.translated(self, dx, dy)
+        (a, b, c, d, e, f) = self.matrix
+        obj.matrix = (a, b, c, d, e+dx, f+dy)
+        return obj
+
     def is_compatible(self, obj):
         """Returns True if two characters can coexist in the same line."""
         return True
@@ -302,6 +321,11 @@ class LTContainer(LTComponent):
             self.add(obj)
         return
 
+    def translated(self, dx, dy):
+        obj = LTComponent.translated(self, dx, dy)
+        obj._objs = [x.translated(dx, dy) for x in self._objs]
+        return obj
+
     def analyze(self, laparams):
         for obj in self._objs:
             obj.analyze(laparams)
@@ -712,6 +736,12 @@ class LTFigure(LTLayoutContainer):
                 (self.__class__.__name__, self.name,
                  bbox2str(self.bbox), matrix2str(self.matrix)))
 
+    def translated(self, dx, dy):
+        obj = LTLayoutContainer.translated(self, dx, dy)
+        (a, b, c, d, e, f) = self.matrix
+        obj.matrix = (a, b, c, d, e+dx, f+dy)
+        return obj
+
     def analyze(self, laparams):
         if not laparams.all_texts:
             return
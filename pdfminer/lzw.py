@@ -101,6 +101,38 @@ def lzwdecode(data):
     fp = BytesIO(data)
     return b''.join(LZWDecoder(fp).run())
 
+
+class ByteReader(object):
+
+    """Reads bytes one by one from an iterator of strings."""
+
+    def __init__(self, chunks):
+        self.bytes = (c for data in chunks for c in data)
+        return
+
+    def read(self, n):
+        assert n == 1
+        return next(self.bytes, b'')
+
+
+# iter_lzwdecode
+def iter_lzwdecode(chunks, bufsiz=65536):
+    """Decodes LZW data given as an iterator of strings.
+
+    The decoded data is yielded in pieces of about bufsiz bytes.
+    """
+    out = []
+    size = 0
+    for x in LZWDecoder(ByteReader(chunks)).run():
+        out.append(x)
+        size += len(x)
+        if bufsiz <= size:
+            yield b''.join(out)
+            out = []
+            size = 0
+    yield b''.join(out)
+    return
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -0,0 +1,516 @@
+#!/usr/bin/env python
+import os
+import os.path
+import mmap
+import gzip
+import logging
+import tempfile
+from collections import OrderedDict
+try:
+    import hashlib as md5
+except ImportError:
+    import md5
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle as pickle
+from .psparser import PSLiteral
+from .psparser import PSKeyword
+from .psparser import LIT
+from .psparser import KWD
+from .pdftypes import PDFObjRef
+from .pdftypes import PDFStream
+
+
+##  PDFObjectCache
+##
+class PDFObjectCache(object):
+
+    """A bounded LRU cache for the objects of a PDFDocument.
+
+    The cache is capped by the number of objects (maxobjs) and by
+    their approximate size in bytes (maxbytes). The decoded data of
+    streams is accounted for separately: when the cache is over its
+    size, decoded data is released first, then the least recently
+    used objects are evicted.
+
+    Decoded data is kept by the (objid, genno) of its stream, so that
+    another instance of the same stream can reuse it without decoding.
+    When it is released, data of spillsize bytes or more is written to
+    a temporary file (up to maxspill bytes in total) and read back
+    through a memory map when the stream is used again. Other data is
+    simply dropped and decoded again when needed. The data used last is
+    not released, unless it is over maxbytes by itself.
+
+    A different eviction policy can be plugged in by subclassing this
+    and overriding getsize() or evict().
+    """
+
+    debug = False
+
+    def __init__(self, maxobjs=100000, maxbytes=256*1024*1024,
+                 spillsize=1024*1024, maxspill=1024*1024*1024, spilldir=None):
+        self.maxobjs = maxobjs
+        self.maxbytes = maxbytes
+        self.spillsize = spillsize
+        self.maxspill = maxspill
+        self.spilldir = spilldir
+        self.objs = OrderedDict()
+        self.streams = OrderedDict()
+        self.spilled = {}
+        self.spillfp = None
+        self.spillmap = None
+        self.objbytes = 0
+        self.databytes = 0
+        self.spillbytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self.data_hits = self.data_misses = 0
+        return
+
+    def __repr__(self):
+        return ('<PDFObjectCache: objs=%d, bytes=%d, streams=%d, data=%d>' %
+                (len(self.objs), self.objbytes, len(self.streams), self.databytes))
+
+    def __len__(self):
+        return len(self.objs)
+
+    def __contains__(self, key):
+        return key in self.objs
+
+    def getsize(self, obj):
+        """Returns the approximate size of an object in bytes.
+
+        Only the object itself is counted, not the objects it contains.
+        """
+        if isinstance(obj, PDFStream):
+            return 64 + obj.rawlen
+        elif isinstance(obj, (dict, list, tuple)):
+            return 64 + 32*len(obj)
+        elif isinstance(obj, str):
+            return 32 + len(obj)
+        return 32
+
+    def get(self, key):
+        """Returns the cached object for key, or raises KeyError."""
+        try:
+            (obj, size) = self.objs.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.objs[key] = (obj, size)
+        self.hits += 1
+        return obj
+
+    def put(self, key, obj, size=None):
+        """Stores an object, evicting old ones if needed."""
+        if key in self.objs:
+            (_, size0) = self.objs.pop(key)
+            self.objbytes -= size0
+        if size is None:
+            size = self.getsize(obj)
+        self.objs[key] = (obj, size)
+        self.objbytes += size
+        self.evict()
+        return
+
+    def remove(self, key):
+        (obj, size) = self.objs.pop(key)
+        self.objbytes -= size
+        return obj
+
+    def getdatakey(self, stream):
+        if stream.objid is None:
+            return id(stream)
+        return (stream.objid, stream.genno)
+
+    def add_data(self, stream):
+        """Records that a stream holds decoded data.
+
+        This is called by PDFStream once it is decoded.
+        """
+        key = self.getdatakey(stream)
+        if key in self.streams:
+            (_, size) = self.streams.pop(key)
+        else:
+            size = len(stream.data)
+            self.databytes += size
+        self.streams[key] = (stream, size)
+        self.evict()
+        return
+
+    def get_data(self, stream):
+        """Returns the decoded data of a stream if it is kept, or None."""
+        key = self.getdatakey(stream)
+        if key in self.streams:
+            (stream1, size) = self.streams.pop(key)
+            self.streams[key] = (stream1, size)
+            self.data_hits += 1
+            return stream1.data
+        if key in self.spilled:
+            (pos, size) = self.spilled[key]
+            if self.spillmap is None or len(self.spillmap) < pos+size:
+                self.spillfp.flush()
+                self.spillmap = mmap.mmap(self.spillfp.fileno(), 0,
+                                          access=mmap.ACCESS_READ)
+            self.data_hits += 1
+            return self.spillmap[pos:pos+size]
+        self.data_misses += 1
+        return None
+
+    def spill(self, key, stream, size):
+        """Writes decoded data to the temporary file if it is worth it."""
+        if key in self.spilled:
+            return
+        if size < self.spillsize or self.maxspill < self.spillbytes+size:
+            return
+        if self.spillfp is None:
+            self.spillfp = tempfile.TemporaryFile(dir=self.spilldir)
+        self.spillfp.seek(0, 2)
+        self.spilled[key] = (self.spillfp.tell(), size)
+        self.spillfp.write(stream.data)
+        self.spillbytes += size
+        return
+
+    def evict(self):
+        """Evicts decoded data, then objects, until the cache fits."""
+        # the most recently decoded data is being used, so it stays,
+        # unless it is over the whole budget by itself.
+        while self.streams and self.maxbytes < self.objbytes+self.databytes:
+            if len(self.streams) == 1 and self.databytes <= self.maxbytes:
+                break
+            (key, (stream, size)) = self.streams.popitem(last=False)
+            self.databytes -= size
+            self.spill(key, stream, size)
+            stream.release()
+            self.evictions += 1
+        # objects are not evicted for the data that stays.
+        kept = 0
+        if self.streams:
+            (_, kept) = self.streams[next(reversed(self.streams))]
+        while self.objs and (self.maxobjs < len(self.objs) or
+                             self.maxbytes < self.objbytes+self.databytes-kept):
+            (key, (obj, size)) = self.objs.popitem(last=False)
+            self.objbytes -= size
+            self.evictions += 1
+            if self.debug:
+                logging.debug('evict: %r' % (key,))
+        return
+
+    def clear(self):
+        for (stream, _) in self.streams.itervalues():
+            stream.release()
+        self.objs.clear()
+        self.streams.clear()
+        self.spilled.clear()
+        if self.spillmap is not None:
+            self.spillmap.close()
+            self.spillmap = None
+        if self.spillfp is not None:
+            self.spillfp.close()
+            self.spillfp = None
+        self.objbytes = self.databytes = self.spillbytes = 0
+        return
+
+    def stats(self):
+        """Returns the cache size and counters."""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.objs),
+            'bytes': self.objbytes,
+            'streams': len(self.streams),
+            'data_bytes': self.databytes,
+            'data_hits': self.data_hits,
+            'data_misses': self.data_misses,
+            'spilled': len(self.spilled),
+            'spill_bytes': self.spillbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': float(self.hits) / total if total else 0.0,
+        }
+
+
+##  PDFParseCache
+##
+class PDFParseCache(object):
+
+    """A persistent cache of parsing results, kept in a directory.
+
+    It stores the xrefs of a document, keyed by the size and mtime
+    of the file and a digest of its head and tail, and the Unicode
+    maps of fonts and the offset tables of object streams, keyed by a
+    digest of their raw stream data.
+    The entries are gzipped pickles. References to PDF objects and
+    to the parser are stored symbolically and bound again to the
+    document they are loaded for.
+
+    The cache directory defaults to $PDFMINER_CACHE_DIR or
+    ~/.cache/pdfminer.
+    """
+
+    debug = False
+
+    # bumped whenever the format of the entries changes.
+    VERSION = 3
+    # bytes at each end of a file that go into its key.
+    SAMPLE_SIZE = 65536
+
+    def __init__(self, cachedir=None):
+        if cachedir is None:
+            cachedir = os.environ.get('PDFMINER_CACHE_DIR')
+        if cachedir is None:
+            cachedir = os.path.join(os.path.expanduser('~'), '.cache', 'pdfminer')
+        self.cachedir = cachedir
+        return
+
+    def __repr__(self):
+        return '<PDFParseCache: %r>' % self.cachedir
+
+    def getdockey(self, parser):
+        """Returns the key of the file that a parser reads."""
+        size = parser.getsize()
+        h = md5.md5(b'%d:%d:' % (self.VERSION, size))
+        try:
+            h.update(repr(os.fstat(parser.fp.fileno()).st_mtime))
+        except (AttributeError, IOError, OSError, ValueError):
+            # not a real file.
+            pass
+        h.update(parser.read(0, self.SAMPLE_SIZE))
+        h.update(parser.read(max(0, size-self.SAMPLE_SIZE), self.SAMPLE_SIZE))
+        return 'doc-'+h.hexdigest()
+
+    def getstreamkey(self, kind, stream, attrs=()):
+        """Returns a key for what is made of a stream's data.
+
+        The values of the given attributes of the stream go into the key.
+        """
+        h = md5.md5(b'%d:%s:' % (self.VERSION, kind))
+        h.update(repr(stream.get_filters()))
+        if attrs:
+            h.update(repr([stream.get(k) for k in attrs]))
+        h.update(stream.get_rawdata())
+        return kind+'-'+h.hexdigest()
+
+    def getpath(self, key):
+        return os.path.join(self.cachedir, key+'.pickle.gz')
+
+    def load(self, key, doc=None):
+        """Returns the object stored for key, or None."""
+        path = self.getpath(key)
+        if not os.path.exists(path):
+            return None
+
+        def persistent_load(pid):
+            (t, v) = pid
+            if t == 'R':
+                return PDFObjRef(doc, v, None)
+            elif t == 'L':
+                return LIT(v)
+            elif t == 'K':
+                return KWD(v)
+            elif t == 'P':
+                return doc._parser
+            raise pickle.UnpicklingError('Unknown id: %r' % (pid,))
+        try:
+            gzfile = gzip.open(path)
+            try:
+                unpickler = pickle.Unpickler(gzfile)
+                unpickler.persistent_load = persistent_load
+                obj = unpickler.load()
+            finally:
+                gzfile.close()
+        except Exception as e:
+            # a broken entry is just ignored.
+            logging.warning('cannot load the parse cache: %r: %r' % (path, e))
+            return None
+        if self.debug:
+            logging.info('load: %r' % path)
+        return obj
+
+    def save(self, key, obj, doc=None):
+        """Stores an object for key."""
+        path = self.getpath(key)
+
+        def persistent_id(x):
+            if isinstance(x, PDFObjRef):
+                return ('R', x.objid)
+            elif isinstance(x, PSLiteral):
+                return ('L', x.name)
+            elif isinstance(x, PSKeyword):
+                return ('K', x.name)
+            elif doc is not None and x is doc._parser:
+                return ('P', None)
+            return None
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            # write to a temporary file and rename it at once,
+            # so that a reader never sees a partial entry.
+            tmppath = '%s.%d.tmp' % (path, os.getpid())
+            gzfile = gzip.open(tmppath, 'wb')
+            try:
+                pickler = pickle.Pickler(gzfile, pickle.HIGHEST_PROTOCOL)
+                pickler.persistent_id = persistent_id
+                pickler.dump(obj)
+            finally:
+                gzfile.close()
+            os.rename(tmppath, path)
+        except (IOError, OSError, pickle.PicklingError, TypeError) as e:
+            logging.warning('cannot save the parse cache: %r: %r' % (path, e))
+            return
+        if self.debug:
+            logging.info('save: %r' % path)
+        return
+
+import unittest
+
+
+##  Simplistic Test cases
+##
+class TestPDFObjectCache(unittest.TestCase):
+
+    def test_1(self):
+        # the least recently used objects are evicted first.
+        cache = PDFObjectCache(maxobjs=3)
+        for key in (1, 2, 3):
+            cache.put(key, 'obj%d' % key)
+        self.assertEqual(cache.get(1), 'obj1')
+        cache.put(4, 'obj4')
+        self.assertEqual(sorted(cache.objs), [1, 3, 4])
+        self.assertRaises(KeyError, cache.get, 2)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 1, 1))
+        # so are they when the cache is over its size.
+        cache = PDFObjectCache(maxbytes=100)
+        cache.put(1, 'a', 40)
+        cache.put(2, 'b', 40)
+        cache.put(1, 'c', 30)
+        self.assertEqual(cache.objbytes, 70)
+        cache.put(3, 'd', 40)
+        self.assertEqual(sorted(cache.objs), [1, 3])
+        self.assertEqual(cache.objbytes, 70)
+        self.assertEqual(cache.get(1), 'c')
+        self.assertEqual(cache.remove(3), 'd')
+        self.assertEqual(cache.objbytes, 30)
+        return
+
+    def make_stream(self, cache, objid, data):
+        stream = PDFStream({}, data)
+        stream.set_objid(objid, 0)
+        stream.cache = cache
+        return stream
+
+    def test_2(self):
+        # decoded data over the cache size is spilled to disk and read back.
+        cache = PDFObjectCache(maxbytes=3000, spillsize=1000)
+        try:
+            s1 = self.make_stream(cache, 1, b'a'*2000)
+            s1.get_data()
+            s2 = self.make_stream(cache, 2, b'b'*2000)
+            s2.get_data()
+            self.assertEqual(s1.data, None)
+            self.assertEqual(cache.spilled.keys(), [(1, 0)])
+            self.assertEqual((cache.databytes, cache.spillbytes), (2000, 2000))
+            # another instance of the same stream reuses the data.
+            s1 = self.make_stream(cache, 1, b'not decoded')
+            self.assertEqual(s1.get_data(), b'a'*2000)
+            self.assertEqual(s2.data, None)
+            self.assertEqual(s2.get_data(), b'b'*2000)
+            self.assertEqual(cache.data_hits, 2)
+            self.assertEqual(cache.spillbytes, 4000)
+            # small data is just dropped and decoded again.
+            s3 = self.make_stream(cache, 3, b'c'*500)
+            s3.get_data()
+            self.make_stream(cache, 4, b'd'*2800).get_data()
+            self.assertEqual(s3.data, None)
+            self.assertFalse((3, 0) in cache.spilled)
+            self.assertEqual(self.make_stream(cache, 3, b'e'*500).get_data(), b'e'*500)
+        finally:
+            cache.clear()
+        self.assertEqual((cache.spillfp, cache.spilled), (None, {}))
+        return
+
+    def test_3(self):
+        # data over the whole budget does not push the objects out.
+        cache = PDFObjectCache(maxbytes=100)
+        for key in (1, 2, 3):
+            cache.put(key, 'obj%d' % key, 20)
+        self.make_stream(cache, 4, b'a'*500).get_data()
+        cache.put(5, 'obj5', 20)
+        self.assertEqual(sorted(cache.objs), [1, 2, 3, 5])
+        cache.put(6, 'obj6', 30)
+        self.assertEqual(sorted(cache.objs), [2, 3, 5, 6])
+        return
+
+    def test_4(self):
+        # data over the whole budget is not kept, but spilled or dropped.
+        cache = PDFObjectCache(maxbytes=1000, spillsize=3000)
+        try:
+            s1 = self.make_stream(cache, 1, b'a'*2000)
+            self.assertEqual(s1.get_data(), b'a'*2000)
+            self.assertEqual((s1.data, cache.databytes, cache.spilled), (None, 0, {}))
+            s2 = self.make_stream(cache, 2, b'b'*4000)
+            self.assertEqual(s2.get_data(), b'b'*4000)
+            self.assertEqual((s2.data, cache.databytes), (None, 0))
+            self.assertEqual(self.make_stream(cache, 2, b'').get_data(), b'b'*4000)
+            # smaller data stays.
+            s3 = self.make_stream(cache, 3, b'c'*500)
+            s3.get_data()
+            self.assertEqual((s3.data, cache.databytes), (b'c'*500, 500))
+        finally:
+            cache.clear()
+        return
+
+
+class TestPDFParseCache(unittest.TestCase):
+
+    def open_document(self, path, cache):
+        from .pdfparser import PDFParser
+        from .pdfdocument import PDFDocument
+        fp = open(path, 'rb')
+        doc = PDFDocument(PDFParser(fp), parsecache=cache)
+        doc.getobj(1)
+        return (fp, doc)
+
+    def test_1(self):
+        import shutil
+        src = os.path.join(os.path.dirname(__file__), '..', 'samples', 'simple1.pdf')
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'simple1.pdf')
+            shutil.copy(src, path)
+            cache = PDFParseCache(os.path.join(tmpdir, 'cache'))
+            loaded = []
+            load = cache.load
+
+            def load1(key, doc=None):
+                obj = load(key, doc)
+                loaded.append(obj is not None)
+                return obj
+            cache.load = load1
+            # the xrefs are saved on the first time,
+            (fp, doc) = self.open_document(path, cache)
+            key = cache.getdockey(doc._parser)
+            fp.close()
+            self.assertTrue(os.path.exists(cache.getpath(key)))
+            # simple1.pdf has no valid xref and is scanned.
+            offsets = doc.xrefs[0].offsets
+            # and used on the next time.
+            (fp, doc) = self.open_document(path, cache)
+            fp.close()
+            self.assertEqual(loaded, [False, True])
+            self.assertEqual(doc.xrefs[0].offsets, offsets)
+            self.assertTrue(doc.xrefs[0].parser is doc._parser)
+            # a modified file is read again.
+            st = os.stat(path)
+            os.utime(path, (st.st_atime, st.st_mtime+10))
+            (fp, doc) = self.open_document(path, cache)
+            self.assertNotEqual(cache.getdockey(doc._parser), key)
+            fp.close()
+            self.assertEqual(loaded, [False, True, False])
+            self.assertEqual(doc.xrefs[0].offsets, offsets)
+        finally:
+            shutil.rmtree(tmpdir)
+        return
+
+if __name__ == '__main__':
+    unittest.main()
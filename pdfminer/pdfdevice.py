@@ -11,6 +11,10 @@ from .pdffont import PDFUnicodeNotDefined
 ##
 class PDFDevice(object):
 
+    # What the device draws: 'text', 'image' and/or 'graphics'
+    # (paths and colors). The interpreter skips the others.
+    capabilities = ('text', 'image', 'graphics')
+
     def __init__(self, rsrcmgr):
         self.rsrcmgr = rsrcmgr
         self.ctm = None
@@ -47,6 +51,16 @@ class PDFDevice(object):
     def end_figure(self, name):
         return
 
+    def reuse_figure(self, name, bbox, matrix, form, resources, state):
+        """Draws a form from an earlier rendering of it.
+
+        state is a key for the text and graphic states the form is
+        drawn in. Returns True if the device did so, and the form is
+        not interpreted. Otherwise it is rendered between
+        begin_figure() and end_figure() as usual.
+        """
+        return False
+
     def paint_path(self, graphicstate, stroke, fill, evenodd, path):
         return
 
@@ -131,6 +145,8 @@ class PDFTextDevice(PDFDevice):
 ##
 class TagExtractor(PDFDevice):
 
+    capabilities = ('text',)
+
     def __init__(self, rsrcmgr, outfp, codec='utf-8'):
         PDFDevice.__init__(self, rsrcmgr)
         self.outfp = outfp
@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 import re
+import time
 import struct
+import array
+import bisect
 import logging
+from collections import deque
 try:
     import hashlib as md5
 except ImportError:
@@ -13,6 +17,7 @@ try:
 except ImportError:
     AES = SHA256 = None
     from . import arcfour as ARC4
+from .psparser import PSException
 from .psparser import PSEOF
 from .psparser import literal_name
 from .psparser import LIT
@@ -21,6 +26,7 @@ from .psparser import STRICT
 from .pdftypes import PDFException
 from .pdftypes import PDFTypeError
 from .pdftypes import PDFStream
+from .pdftypes import PDFObjRef
 from .pdftypes import PDFObjectNotFound
 from .pdftypes import decipher_all
 from .pdftypes import int_value
@@ -30,8 +36,11 @@ from .pdftypes import dict_value
 from .pdftypes import stream_value
 from .pdfparser import PDFSyntaxError
 from .pdfparser import PDFStreamParser
+from .pdfcache import PDFObjectCache
 from .utils import choplist
-from .utils import nunpack
+from .utils import nunpack_array
+from .utils import UINT32
+from .utils import unpack_bits
 from .utils import decode_text
 
 
@@ -59,6 +68,7 @@ class PDFTextExtractionNotAllowed(PDFEncryptionError):
 LITERAL_OBJSTM = LIT('ObjStm')
 LITERAL_XREF = LIT('XRef')
 LITERAL_CATALOG = LIT('Catalog')
+LITERAL_PAGE = LIT('Page')
 
 
 ##  XRefs
@@ -66,6 +76,9 @@ LITERAL_CATALOG = LIT('Catalog')
 class PDFBaseXRef(object):
 
     debug = False
+    # the revision (incremental update) that the xref belongs to,
+    # counted from the newest one.
+    revision = 0
     
     def get_trailer(self):
         raise NotImplementedError
@@ -84,13 +97,44 @@ class PDFBaseXRef(object):
 ##
 class PDFXRef(PDFBaseXRef):
 
+    """XRef stored in a classic cross-reference table.
+
+    The offsets and generation numbers are kept in two arrays indexed
+    by objid (-1 marks a missing object). An objid far beyond the end
+    of the arrays goes to a dict instead, so that a stray large number
+    does not blow up the arrays.
+    """
+
+    MAX_GAP = 65536
+
     def __init__(self):
-        self.offsets = {}
+        self.positions = array.array('l')
+        self.gennos = array.array(UINT32)
+        self.sparse = {}
         self.trailer = {}
         return
 
     def __repr__(self):
-        return '<PDFXRef: offsets=%r>' % (self.offsets.keys())
+        return '<PDFXRef: objids=%r>' % (list(self.get_objids()))
+
+    def set_pos(self, objid, pos, genno):
+        n = len(self.positions)
+        if n <= objid:
+            if n+self.MAX_GAP < objid:
+                self.sparse[objid] = (pos, genno)
+                return
+            self.positions.extend(array.array('l', [-1])*(objid+1-n))
+            self.gennos.extend(array.array(UINT32, [0])*(objid+1-n))
+            if self.sparse:
+                # objids put aside that are now within the arrays.
+                for objid1 in [k for k in self.sparse if k <= objid]:
+                    (self.positions[objid1], self.gennos[objid1]) = self.sparse.pop(objid1)
+        self.positions[objid] = pos
+        self.gennos[objid] = genno
+        return
+
+    # a subsection entry, always 20 bytes long.
+    XREF_ENTRY = re.compile(br'(\d{10}) (\d{5}) ([fn])(?:\r\n| \r| \n)')
 
     def load(self, parser):
         while 1:
@@ -112,19 +156,28 @@ class PDFXRef(PDFBaseXRef):
                 (start, nobjs) = map(long, f)
             except ValueError:
                 raise PDFNoValidXRef('Invalid line: %r: line=%r' % (parser, line))
-            for objid in xrange(start, start+nobjs):
-                try:
-                    (_, line) = parser.nextline()
-                except PSEOF:
-                    raise PDFNoValidXRef('Unexpected EOF - file corrupted?')
-                f = line.strip().split(b' ')
-                if len(f) != 3:
-                    raise PDFNoValidXRef('Invalid XRef format: %r, line=%r' % (parser, line))
-                (pos, genno, use) = f
-                if use != b'n':
-                    continue
-                self.offsets[objid] = (None, long(pos), int(genno))
-        if self.debug: logging.info('xref objects: %r' % self.offsets)
+            # read the whole subsection at once if it is well-formed.
+            pos = parser.tell()
+            ents = self.XREF_ENTRY.findall(parser.read(pos, nobjs*20))
+            if len(ents) == nobjs:
+                parser.seek(pos+nobjs*20)
+            else:
+                ents = []
+                for _ in xrange(nobjs):
+                    try:
+                        (_, line) = parser.nextline()
+                    except PSEOF:
+                        raise PDFNoValidXRef('Unexpected EOF - file corrupted?')
+                    f = line.strip().split(b' ')
+                    if len(f) != 3:
+                        raise PDFNoValidXRef('Invalid XRef format: %r, line=%r' % (parser, line))
+                    ents.append(f)
+            objid = start
+            for (pos, genno, use) in ents:
+                if use == b'n':
+                    self.set_pos(objid, long(pos), int(genno))
+                objid += 1
+        if self.debug: logging.info('xref objects: %r' % self)
         self.load_trailer(parser)
         return
 
@@ -147,80 +200,141 @@ class PDFXRef(PDFBaseXRef):
         return self.trailer
 
     def get_objids(self):
-        return self.offsets.iterkeys()
+        for (objid, pos) in enumerate(self.positions):
+            if 0 <= pos:
+                yield objid
+        for objid in self.sparse.iterkeys():
+            yield objid
+        return
 
     def get_pos(self, objid):
-        try:
-            return self.offsets[objid]
-        except KeyError:
-            raise
+        if 0 <= objid < len(self.positions):
+            pos = self.positions[objid]
+            if 0 <= pos:
+                return (None, pos, self.gennos[objid])
+        elif objid in self.sparse:
+            (pos, genno) = self.sparse[objid]
+            return (None, pos, genno)
+        raise KeyError(objid)
 
 
 ##  PDFXRefFallback
 ##
 class PDFXRefFallback(PDFXRef):
 
+    """XRef rebuilt by scanning the whole file.
+
+    Object headers ("N G obj") and trailers are located with a single
+    regular expression pass over the (memory-mapped) file; only their
+    offsets are recorded and stream bodies are skipped. Later objects
+    and trailer entries win over earlier ones. Object streams are
+    expanded only when an object is not found otherwise.
+    """
+
+    def __init__(self):
+        PDFXRef.__init__(self)
+        self.offsets = {}
+        self.parser = None
+        self.objstms = deque()
+        return
+
     def __repr__(self):
         return '<PDFXRefFallback: offsets=%r>' % (self.offsets.keys())
 
-    PDFOBJ_CUE = re.compile(r'^(\d+)\s+(\d+)\s+obj\b')
+    PDFOBJ_CUE = re.compile(br'''
+(?:(?<=[\r\n])|\A)
+(?: (?P<objid>\d+)\s+(?P<genno>\d+)\s+obj\b
+  | (?P<trailer>trailer) )
+| (?P<stream>\bstream(?:\r\n|\r|\n))
+''', re.VERBOSE)
 
     def load(self, parser):
-        parser.seek(0)
+        self.parser = parser
+        data = parser.getbuffer()
+        trailers = []
+        (objid, objpos) = (None, 0)
+        i = 0
         while 1:
-            try:
-                (pos, line) = parser.nextline()
-            except PSEOF:
+            m = self.PDFOBJ_CUE.search(data, i)
+            if not m:
                 break
-            if line.startswith(b'trailer'):
-                parser.seek(pos)
+            i = m.end()
+            if m.group('objid') is not None:
+                objid = int(m.group('objid'))
+                genno = int(m.group('genno'))
+                objpos = m.start()
+                self.offsets[objid] = (None, objpos, genno)
+            elif m.group('trailer') is not None:
+                trailers.append(m.start())
+            elif objid is not None:
+                # remember possible ObjStms and skip the stream body.
+                if data.find(b'/ObjStm', objpos, m.start()) != -1:
+                    self.objstms.append(objid)
+                objid = None
+                j = data.find(b'endstream', i)
+                if j != -1:
+                    i = j
+        for pos in trailers:
+            parser.seek(pos)
+            try:
                 self.load_trailer(parser)
-                if self.debug: logging.info('trailer: %r' % self.get_trailer())
-                break
-            m = self.PDFOBJ_CUE.match(line)
-            if not m:
+            except (PSException, AssertionError):
                 continue
-            (objid, genno) = m.groups()
-            objid = int(objid)
-            genno = int(genno)
-            self.offsets[objid] = (None, pos, genno)
-            # expand ObjStm.
-            parser.seek(pos)
-            (_, obj) = parser.nextobject()
-            if isinstance(obj, PDFStream) and obj.get('Type') is LITERAL_OBJSTM:
-                stream = stream_value(obj)
-                try:
-                    n = stream['N']
-                except KeyError:
-                    if STRICT:
-                        raise PDFSyntaxError('N is not defined: %r' % stream)
-                    n = 0
-                parser1 = PDFStreamParser(stream.get_data())
-                objs = []
-                try:
-                    while 1:
-                        (_, obj) = parser1.nextobject()
-                        objs.append(obj)
-                except PSEOF:
-                    pass
-                n = min(n, len(objs)//2)
-                for index in xrange(n):
-                    objid1 = objs[index*2]
-                    self.offsets[objid1] = (objid, index, 0)
+        if self.debug: logging.info('trailer: %r' % self.get_trailer())
         return
 
+    def load_objstm(self, strmid):
+        """Registers the objects contained in the given ObjStm."""
+        doc = self.parser.doc
+        if doc is None:
+            return
+        try:
+            stream = stream_value(doc.getobj(strmid))
+        except (PSException, KeyError):
+            return
+        if stream.get('Type') is not LITERAL_OBJSTM:
+            return
+        try:
+            index1 = doc._get_objstm_offsets(stream)
+        except PSException:
+            return
+        for (index, (objid1, _)) in enumerate(index1):
+            if objid1 not in self.offsets:
+                self.offsets[objid1] = (strmid, index, 0)
+        return
+
+    def get_objids(self):
+        while self.objstms:
+            self.load_objstm(self.objstms.popleft())
+        return self.offsets.iterkeys()
+
+    def get_pos(self, objid):
+        while objid not in self.offsets and self.objstms:
+            self.load_objstm(self.objstms.popleft())
+        return self.offsets[objid]
+
 
 ##  PDFXRefStream
 ##
 class PDFXRefStream(PDFBaseXRef):
 
+    """XRef stored in a cross-reference stream (PDF-1.5).
+
+    The entries are unpacked once at load time into three arrays
+    (types, fields2, fields3) indexed by the entry number.
+    get_pos() finds the entry number with a binary search over
+    the starts of the subsections.
+    """
+
     debug = False
     
     def __init__(self):
-        self.data = None
         self.entlen = None
         self.fl1 = self.fl2 = self.fl3 = None
         self.ranges = []
+        self.sections = []
+        self.starts = []
+        self.types = self.fields2 = self.fields3 = None
         return
 
     def __repr__(self):
@@ -239,52 +353,131 @@ class PDFXRefStream(PDFBaseXRef):
             raise PDFSyntaxError('Invalid index number')
         self.ranges.extend(choplist(2, index_array))
         (self.fl1, self.fl2, self.fl3) = stream['W']
-        self.data = stream.get_data()
         self.entlen = self.fl1+self.fl2+self.fl3
         self.trailer = stream.attrs
+        self.load_entries(stream.get_data())
         if self.debug:
             logging.info('xref stream: objid=%s, fields=%d,%d,%d' %
                      (', '.join(map(repr, self.ranges)),
                       self.fl1, self.fl2, self.fl3))
         return
 
+    def load_entries(self, data):
+        if not self.entlen:
+            raise PDFNoValidXRef('Invalid field widths: %r' % self.entlen)
+        n = len(data) // self.entlen
+
+        def unpack(offset, width, default):
+            if not width:
+                return array.array(UINT32, [default])*n
+            try:
+                return nunpack_array(data, offset, width, self.entlen, n)
+            except TypeError:
+                raise PDFNoValidXRef('Invalid field width: %r' % width)
+        self.types = unpack(0, self.fl1, 1)
+        self.fields2 = unpack(self.fl1, self.fl2, 0)
+        self.fields3 = unpack(self.fl1+self.fl2, self.fl3, 0)
+        # subsections sorted by their first objid.
+        base = 0
+        for (start, nobjs) in self.ranges:
+            self.sections.append((start, nobjs, base))
+            base += nobjs
+        self.sections.sort()
+        self.starts = [start for (start, _, _) in self.sections]
+        return
+
     def get_trailer(self):
         return self.trailer
 
     def get_objids(self):
+        types = self.types
+        n = len(types)
+        base = 0
         for (start, nobjs) in self.ranges:
-            for i in xrange(nobjs):
-                offset = self.entlen * i
-                ent = self.data[offset:offset+self.entlen]
-                f1 = nunpack(ent[:self.fl1], 1)
-                if f1 == 1 or f1 == 2:
-                    yield start+i
+            for i in xrange(base, min(base+nobjs, n)):
+                if types[i] == 1 or types[i] == 2:
+                    yield start+i-base
+            base += nobjs
         return
 
     def get_pos(self, objid):
-        index = 0
-        for (start, nobjs) in self.ranges:
-            if start <= objid and objid < start+nobjs:
-                index += objid - start
-                break
-            else:
-                index += nobjs
-        else:
+        i = bisect.bisect_right(self.starts, objid)-1
+        if i < 0:
+            raise KeyError(objid)
+        (start, nobjs, base) = self.sections[i]
+        if start+nobjs <= objid or len(self.types) <= base+objid-start:
             raise KeyError(objid)
-        offset = self.entlen * index
-        ent = self.data[offset:offset+self.entlen]
-        f1 = nunpack(ent[:self.fl1], 1)
-        f2 = nunpack(ent[self.fl1:self.fl1+self.fl2])
-        f3 = nunpack(ent[self.fl1+self.fl2:])
+        index = base+objid-start
+        f1 = self.types[index]
         if f1 == 1:
-            return (None, f2, f3)
+            return (None, self.fields2[index], self.fields3[index])
         elif f1 == 2:
-            return (f2, f3, 0)
+            return (self.fields2[index], self.fields3[index], 0)
         else:
             # this is a free object
             raise KeyError(objid)
 
 
+##  PDFXRefIndex
+##
+class PDFXRefIndex(object):
+
+    """Merged index over the xrefs of a document.
+
+    For every objid, it records the number of the first (i.e. newest)
+    xref that has the object, so that getobj() finds it with a single
+    probe instead of asking each revision in turn. Only the leading
+    xrefs that can list their objects cheaply are indexed; a
+    PDFXRefFallback and the xrefs after it are always probed.
+    """
+
+    MAX_GAP = 65536
+    # marks an objid that no indexed xref has.
+    NONE = 65535
+
+    def __init__(self, xrefs):
+        self.xrefnos = array.array('H')
+        self.sparse = {}
+        n = 0
+        for xref in xrefs:
+            if isinstance(xref, PDFXRefFallback) or n == self.NONE:
+                break
+            n += 1
+        self.nindexed = n
+        # older xrefs first so that newer ones win.
+        for i in reversed(xrange(n)):
+            for objid in xrefs[i].get_objids():
+                self.set(objid, i)
+        return
+
+    def __repr__(self):
+        return '<PDFXRefIndex: xrefs=%d, objs=%d>' % (self.nindexed, len(self.xrefnos)+len(self.sparse))
+
+    def set(self, objid, i):
+        n = len(self.xrefnos)
+        if n <= objid:
+            if n+self.MAX_GAP < objid:
+                self.sparse[objid] = i
+                return
+            self.xrefnos.extend(array.array('H', [self.NONE])*(objid+1-n))
+            if self.sparse:
+                # objids put aside that are now within the array.
+                for objid1 in [k for k in self.sparse if k <= objid]:
+                    self.xrefnos[objid1] = self.sparse.pop(objid1)
+        self.xrefnos[objid] = i
+        return
+
+    def find(self, objid):
+        """Returns the number of the first xref that may have objid."""
+        if 0 <= objid < len(self.xrefnos):
+            i = self.xrefnos[objid]
+            if i != self.NONE:
+                return i
+        elif objid in self.sparse:
+            return self.sparse[objid]
+        return self.nindexed
+
+
 ##  PDFSecurityHandler
 ##
 class PDFStandardSecurityHandler(object):
@@ -524,6 +717,31 @@ class PDFDocument(object):
       doc = PDFDocument(parser, password)
       obj = doc.getobj(objid)
 
+    The XRefs are normally read from the chain that starts at the
+    end of the file. Only if it cannot be read or does not look right,
+    the whole file is scanned for objects instead (PDFXRefFallback).
+    Passing fallback=True forces the scan. PDFDocument.fallback_count
+    counts how many times the scan has been done.
+
+    Objects are kept in a PDFObjectCache, which is bounded in size.
+    caching can be True (a cache with the default limits), False
+    (no objects are cached, except for the last few object streams
+    parsed and some decoded data) or a PDFObjectCache instance.
+
+    With a PDFParseCache (parsecache), the xrefs and the offset tables
+    of object streams are saved on disk and loaded from there the next
+    time the same file is opened.
+
+    When linearized is True and the file is linearized, only the
+    first-page xref at the beginning of the file is read; the rest
+    of the xrefs are read when an object is not found there.
+    find_page() locates other pages with the hint tables.
+
+    An incrementally updated file has several revisions (the number
+    is in self.revisions). Passing revision opens the document as it
+    was at that revision, counted from the original one (0); objects
+    added or changed by later updates are not seen.
+
     """
 
     security_handler_registry = {
@@ -536,33 +754,69 @@ class PDFDocument(object):
             security_handler_registry[5] = PDFStandardSecurityHandlerV5
 
     debug = 0
-
-    def __init__(self, parser, password=b'', caching=True, fallback=True):
+    fallback_count = 0
+    # number of parsed object streams (and bytes of decoded data)
+    # kept when caching is off.
+    MIN_CACHE_SIZE = 4
+    MIN_CACHE_BYTES = 32*1024*1024
+
+    def __init__(self, parser, password=b'', caching=True, fallback=False,
+                 parsecache=None, revision=None, linearized=False):
         "Set the document to use a given PDFParser object."
-        self.caching = caching
+        if isinstance(caching, PDFObjectCache):
+            self.cache = caching
+            self.caching = True
+        elif caching:
+            self.cache = PDFObjectCache()
+            self.caching = True
+        else:
+            self.cache = PDFObjectCache(maxobjs=self.MIN_CACHE_SIZE,
+                                        maxbytes=self.MIN_CACHE_BYTES)
+            self.caching = False
         self.xrefs = []
+        self.xref_stats = []
         self.info = []
         self.catalog = None
         self.encryption = None
         self.decipher = None
         self._parser = None
-        self._cached_objs = {}
-        self._parsed_objs = {}
         self._parser = parser
         self._parser.set_document(self)
         self.is_printable = self.is_modifiable = self.is_extractable = True
-        # Retrieve the information of each header that was appended
-        # (maybe multiple times) at the end of the document.
-        try:
-            pos = self.find_xref(parser)
-            self.read_xref_from(parser, pos, self.xrefs)
-        except PDFNoValidXRef:
-            fallback = True
-        if fallback:
-            parser.fallback = True
-            xref = PDFXRefFallback()
-            xref.load(parser)
-            self.xrefs.append(xref)
+        self.linearized = None
+        self._deferred_xrefs = []
+        self._hintxref = None
+        self._page_hints = None
+        self.parsecache = parsecache
+        entry = None
+        if parsecache is not None:
+            key = parsecache.getdockey(parser)
+            entry = parsecache.load(key, self)
+        lin = None
+        if linearized and not fallback and revision is None:
+            lin = self.find_linearization(parser)
+        if lin is not None:
+            (self.linearized, pos) = lin
+        if entry is not None:
+            # warm start from the xrefs read last time.
+            (self.xrefs, fallback) = entry
+            parser.fallback = fallback
+        elif lin is not None and self._load_first_page_xref(parser, pos):
+            # the other xrefs are read when they are needed.
+            pass
+        else:
+            self._load_xrefs(parser, fallback)
+            if parsecache is not None:
+                parsecache.save(key, (self.xrefs, parser.fallback), self)
+        self.revisions = 1+max(xref.revision for xref in self.xrefs)
+        if revision is not None:
+            if not (0 <= revision < self.revisions):
+                raise PDFException('Invalid revision: %r (%d revisions)' %
+                                   (revision, self.revisions))
+            # drop the xrefs of later revisions.
+            skip = self.revisions-1-revision
+            self.xrefs = [xref for xref in self.xrefs if skip <= xref.revision]
+        self.xrefindex = PDFXRefIndex(self.xrefs)
         for xref in self.xrefs:
             trailer = xref.get_trailer()
             if not trailer:
@@ -586,6 +840,198 @@ class PDFDocument(object):
                 raise PDFSyntaxError('Catalog not found!')
         return
 
+    def _load_xrefs(self, parser, fallback):
+        # Retrieve the information of each header that was appended
+        # (maybe multiple times) at the end of the document.
+        try:
+            pos = self.find_xref(parser)
+            self.read_xref_from(parser, pos, self.xrefs)
+            self.validate_xrefs(parser)
+        except (PSException, KeyError, ValueError) as e:
+            logging.info('xref broken, scanning the whole file: %r' % e)
+            fallback = True
+        if fallback:
+            PDFDocument.fallback_count += 1
+            parser.fallback = True
+            xref = PDFXRefFallback()
+            xref.load(parser)
+            self.xrefs.append(xref)
+        return
+
+    # linearization
+    def find_linearization(self, parser, check_length=True):
+        """Finds the linearization dictionary.
+
+        Returns the dictionary and the position right after the
+        object, or None. The dictionary is the first object in the
+        file. If the file has been updated since it was linearized
+        (its length differs from /L), it is not used unless
+        check_length is False.
+        """
+        data = parser.read(0, 1024)
+        m = self.OBJ_HEADER.search(data)
+        if not m:
+            return None
+        # the parser consumes endobj along with the dictionary.
+        end = data.find(b'endobj', m.end())
+        if end < 0:
+            return None
+        try:
+            parser.seek(m.start())
+            parser.reset()
+            parser.nexttoken()  # objid
+            parser.nexttoken()  # genno
+            parser.nexttoken()  # obj
+            (_, dic) = parser.nextobject()
+            if not isinstance(dic, dict) or 'Linearized' not in dic:
+                return None
+            if check_length and int_value(dic.get('L')) != parser.getsize():
+                return None
+        except (PSException, KeyError, ValueError):
+            return None
+        if self.debug:
+            logging.info('linearized: %r' % dic)
+        return (dic, end+len(b'endobj'))
+
+    def _load_first_page_xref(self, parser, pos):
+        # the first-page xref follows the linearization dictionary.
+        try:
+            xref = self.read_xref_section(parser, pos)
+            self.xrefs.append(xref)
+            self.validate_xrefs(parser)
+        except (PSException, KeyError, ValueError) as e:
+            logging.info('first-page xref broken: %r' % e)
+            del self.xrefs[:]
+            self.linearized = None
+            return False
+        trailer = xref.get_trailer()
+        # the main xref belongs to the same revision (there is only
+        # one, as the file has not been updated).
+        for k in ('XRefStm', 'Prev'):
+            if k in trailer:
+                self._deferred_xrefs.append(int_value(trailer[k]))
+        # objects located with the hint tables.
+        self._hintxref = PDFXRef()
+        self.xrefs.append(self._hintxref)
+        return True
+
+    def _load_deferred_xrefs(self):
+        if not self._deferred_xrefs:
+            return False
+        parser = self._parser
+        xrefs = []
+        try:
+            for pos in self._deferred_xrefs:
+                self.read_xref_from(parser, pos, xrefs)
+        except (PSException, KeyError, ValueError) as e:
+            logging.info('xref broken, scanning the whole file: %r' % e)
+            PDFDocument.fallback_count += 1
+            xref = PDFXRefFallback()
+            xref.load(parser)
+            xrefs.append(xref)
+        self._deferred_xrefs = []
+        self._hintxref = None
+        # they come after the first-page xref.
+        self.xrefs[1:1] = xrefs
+        self.revisions = 1+max(xref.revision for xref in self.xrefs)
+        self.xrefindex = PDFXRefIndex(self.xrefs)
+        return True
+
+    def _get_page_hints(self):
+        """Reads the page offset hint table of a linearized file.
+
+        Returns a list of (pos, length) for each page, the range of
+        bytes that holds the objects of the page, which start with the
+        page object itself.
+        """
+        lin = self.linearized
+        (hpos, hlen) = list_value(lin['H'])[:2]
+        parser = self._parser
+        m = self.OBJ_HEADER.match(parser.read(hpos, 64))
+        if not m:
+            raise PDFSyntaxError('Hint stream not found: %r' % hpos)
+        (objid, genno) = (int(m.group(1)), int(m.group(2)))
+        stream = stream_value(self._getobj_parse(hpos, objid))
+        stream.set_objid(objid, genno)
+        data = stream.get_data()
+        # the header is 36 bytes long; only its first items are used.
+        (_, firstpos, objbits, minlen, lenbits) = struct.unpack('>IIHIH', data[:16])
+        npages = int_value(lin['N'])
+        # each item of the per-page entries starts at a byte boundary;
+        # the numbers of objects come before the lengths.
+        bitpos = 36*8 + (objbits*npages+7)//8*8
+        if len(data)*8 < bitpos+lenbits*npages:
+            raise PDFSyntaxError('Hint table truncated: %r' % len(data))
+        lengths = unpack_bits(data, bitpos, lenbits, npages)
+        pages = []
+        pos = firstpos
+        for i in xrange(npages):
+            length = minlen+lengths[i]
+            # the offsets are given as if the hint stream were not there.
+            if hpos <= pos:
+                pages.append((pos+hlen, length))
+            else:
+                pages.append((pos, length))
+            pos += length
+        return pages
+
+    def find_page(self, pageno):
+        """Returns the objid of a page of a linearized file, or None.
+
+        The first page is given by the linearization dictionary.
+        Other pages are found with the page offset hint table: the
+        page object is the first one in the page's range of bytes,
+        and the objects there are located without reading the other
+        xrefs.
+        """
+        if self.linearized is None:
+            return None
+        if pageno == 0:
+            objid = int_value(self.linearized['O'])
+        else:
+            if self._page_hints is None:
+                try:
+                    self._page_hints = self._get_page_hints()
+                except (PSException, KeyError, ValueError, TypeError,
+                        IndexError, struct.error) as e:
+                    logging.info('hint table broken: %r' % e)
+                    self._page_hints = []
+            if not (0 <= pageno < len(self._page_hints)):
+                return None
+            (pos, length) = self._page_hints[pageno]
+            m = self.OBJ_HEADER.match(self._parser.read(pos, 64))
+            if not m:
+                return None
+            objid = int(m.group(1))
+            if self._hintxref is not None:
+                self._register_objects(pos, self._parser.read(pos, length))
+        try:
+            page = dict_value(self.getobj(objid))
+        except (PSException, PDFObjectNotFound):
+            return None
+        if page.get('Type') is not LITERAL_PAGE:
+            return None
+        return objid
+
+    def _register_objects(self, pos, data):
+        # stream bodies are skipped as in PDFXRefFallback.load().
+        i = 0
+        while 1:
+            m = PDFXRefFallback.PDFOBJ_CUE.search(data, i)
+            if not m:
+                break
+            i = m.end()
+            if m.group('objid') is not None:
+                self._hintxref.set_pos(int(m.group('objid')), pos+m.start(),
+                                       int(m.group('genno')))
+            elif m.group('stream') is not None:
+                j = data.find(b'endstream', i)
+                if j == -1:
+                    break
+                i = j
+        self.xrefindex = PDFXRefIndex(self.xrefs)
+        return
+
     # _initialize_password(password=b'')
     #   Perform the initialization with a given password.
     def _initialize_password(self, password=b''):
@@ -605,39 +1051,78 @@ class PDFDocument(object):
         return
 
     def _getobj_objstm(self, stream, index, objid):
-        if stream.objid in self._parsed_objs:
-            (objs, n) = self._parsed_objs[stream.objid]
-        else:
-            (objs, n) = self._get_objects(stream)
-            if self.caching:
-                self._parsed_objs[stream.objid] = (objs, n)
-        i = n*2+index
+        key = ('objstm', stream.objid)
         try:
-            obj = objs[i]
+            (index1, data) = self.cache.get(key)
+        except KeyError:
+            if self.parsecache is None:
+                (index1, data) = self._get_objstm_index(stream)
+            else:
+                index1 = self._get_objstm_offsets(stream)
+                data = stream.get_data()
+            self.cache.put(key, (index1, data), 64+16*len(index1)+len(data))
+        try:
+            (_, pos) = index1[index]
         except IndexError:
             raise PDFSyntaxError('index too big: %r' % index)
+        # parse only the requested object.
+        parser = PDFStreamParser(data)
+        parser.set_document(self)
+        parser.seek(pos)
+        (_, obj) = parser.nextobject()
         return obj
 
-    def _get_objects(self, stream):
+    def _get_objstm_offsets(self, stream):
+        """Returns the (objid, pos) pairs of an ObjStm.
+
+        They are kept in the parse cache, if any, so that the stream
+        is not decoded only to read its header again.
+        """
+        if self.parsecache is None:
+            return self._get_objstm_index(stream)[0]
+        key = self.parsecache.getstreamkey('objstm', stream, ('N', 'First'))
+        index = self.parsecache.load(key)
+        if index is None:
+            index = self._get_objstm_index(stream)[0]
+            self.parsecache.save(key, index)
+        return index
+
+    def _get_objstm_index(self, stream):
+        """Reads the header of an ObjStm.
+
+        Returns a list of (objid, pos) pairs, where pos is the offset
+        of each object in the decoded data, together with the data.
+        """
         if stream.get('Type') is not LITERAL_OBJSTM:
             if STRICT:
                 raise PDFSyntaxError('Not a stream object: %r' % stream)
         try:
-            n = stream['N']
+            n = int_value(stream['N'])
         except KeyError:
             if STRICT:
                 raise PDFSyntaxError('N is not defined: %r' % stream)
             n = 0
-        parser = PDFStreamParser(stream.get_data())
-        parser.set_document(self)
-        objs = []
+        data = stream.get_data()
+        parser = PDFStreamParser(data)
+        pairs = []
         try:
-            while 1:
-                (_, obj) = parser.nextobject()
-                objs.append(obj)
+            for _ in xrange(n):
+                (_, objid) = parser.nexttoken()
+                (_, pos) = parser.nexttoken()
+                if not isinstance(objid, int) or not isinstance(pos, int):
+                    raise PDFSyntaxError('Invalid ObjStm header: %r' % stream)
+                pairs.append((objid, pos))
+            if 'First' in stream:
+                first = int_value(stream['First'])
+            else:
+                # the objects start right after the header.
+                (first, _) = parser.nexttoken()
         except PSEOF:
-            pass
-        return (objs, n)
+            if STRICT:
+                raise PDFSyntaxError('ObjStm header truncated: %r' % stream)
+            first = len(data)
+        index = [(objid, first+pos) for (objid, pos) in pairs]
+        return (index, data)
 
     KEYWORD_OBJ = KWD('obj')
 
@@ -660,10 +1145,14 @@ class PDFDocument(object):
             raise PDFException('PDFDocument is not initialized')
         if self.debug:
             logging.debug('getobj: objid=%r' % objid)
-        if objid in self._cached_objs:
-            (obj, genno) = self._cached_objs[objid]
-        else:
-            for xref in self.xrefs:
+        try:
+            if not self.caching:
+                raise KeyError(objid)
+            (obj, genno) = self.cache.get(objid)
+        except KeyError:
+            # skip the xrefs that are known not to have it.
+            i = self.xrefindex.find(objid)
+            for xref in self.xrefs[i:]:
                 try:
                     (strmid, index, genno) = xref.get_pos(objid)
                 except KeyError:
@@ -683,11 +1172,16 @@ class PDFDocument(object):
                 except (PSEOF, PDFSyntaxError):
                     continue
             else:
+                if self._load_deferred_xrefs():
+                    return self.getobj(objid)
                 raise PDFObjectNotFound(objid)
             if self.debug:
                 logging.debug('register: objid=%r: %r' % (objid, obj))
+            if isinstance(obj, PDFStream):
+                # decoded data is shared even when caching is off.
+                obj.cache = self.cache
             if self.caching:
-                self._cached_objs[objid] = (obj, genno)
+                self.cache.put(objid, (obj, genno), self.cache.getsize(obj))
         return obj
 
     def get_outlines(self):
@@ -752,27 +1246,125 @@ class PDFDocument(object):
         return obj
 
     # find_xref
+    XREF_TAIL_SIZE = 8192
+    XREF_MAX_SCAN = 1024*1024
+    STARTXREF = re.compile(br'startxref\s+(\d+)')
+
     def find_xref(self, parser):
         """Internal function used to locate the first XRef."""
-        # search the last xref table by scanning the file backwards.
-        prev = None
-        for line in parser.revreadlines():
-            line = line.strip()
+        # search the last startxref in the tail of the file.
+        # If it is not there, read further backwards (doubling the amount
+        # each time) but give up after XREF_MAX_SCAN bytes.
+        end = parser.getsize()
+        pos = max(0, end-self.XREF_TAIL_SIZE)
+        data = parser.read(pos, end-pos)
+        i = len(data)
+        while 1:
             if self.debug:
-                logging.debug('find_xref: %r' % line)
-            if line == b'startxref':
+                logging.debug('find_xref: pos=%r, size=%r' % (pos, len(data)))
+            while 1:
+                i = data.rfind(b'startxref', 0, i)
+                if i < 0:
+                    break
+                m = self.STARTXREF.match(data, i)
+                if m:
+                    if self.debug:
+                        logging.info('xref found: pos=%r' % m.group(1))
+                    return long(m.group(1))
+            if pos == 0 or self.XREF_MAX_SCAN <= end-pos:
+                raise PDFNoValidXRef('startxref not found')
+            pos1 = max(0, pos-len(data), end-self.XREF_MAX_SCAN)
+            s = parser.read(pos1, pos-pos1)
+            # a keyword split at the boundary is searched again.
+            i = len(s)+len(b'startxref')-1
+            data = s+data
+            pos = pos1
+
+    # validate_xrefs
+    OBJ_HEADER = re.compile(br'\s*(\d+)\s+(\d+)\s+obj\b')
+
+    def validate_xrefs(self, parser):
+        """Checks that the XRefs point to the /Root object."""
+        for xref in self.xrefs:
+            trailer = xref.get_trailer()
+            if 'Root' in trailer:
                 break
-            if line:
-                prev = line
         else:
-            raise PDFNoValidXRef('Unexpected EOF')
-        if self.debug:
-            logging.info('xref found: pos=%r' % prev)
-        return long(prev)
+            raise PDFNoValidXRef('No /Root in trailers')
+        ref = trailer['Root']
+        if not isinstance(ref, PDFObjRef):
+            return
+        for xref in self.xrefs:
+            try:
+                (strmid, index, genno) = xref.get_pos(ref.objid)
+                break
+            except KeyError:
+                continue
+        else:
+            raise PDFNoValidXRef('/Root not in xref: %r' % ref)
+        if strmid is None:
+            # the offset must point to the object itself.
+            m = self.OBJ_HEADER.match(parser.read(index, 64))
+            if not m or int(m.group(1)) != ref.objid:
+                raise PDFNoValidXRef('/Root offset is wrong: %r' % index)
+        return
 
     # read xref table
-    def read_xref_from(self, parser, start, xrefs):
-        """Reads XRefs from the given location."""
+    # at most this many xref sections are read from a chain.
+    XREF_MAX_CHAIN = 1000
+
+    def read_xref_from(self, parser, start, xrefs, revision=0):
+        """Reads XRefs from the given location, following the chain.
+
+        The chain (XRefStm and Prev) is followed without recursion.
+        An offset that has already been read is skipped, and a chain
+        longer than XREF_MAX_CHAIN is rejected. The time spent on each
+        section is recorded in self.xref_stats as (pos, xref, seconds).
+
+        Each Prev leads to an earlier revision, except the one from
+        the first-page xref of a linearized file to its main xref.
+        """
+        lin = self.find_linearization(parser, check_length=False)
+        firstpage = None
+        if lin is not None:
+            firstpage = lin[1]
+        visited = set()
+        # the XRefStm of a section is read before its Prev.
+        stack = [(start, revision)]
+        while stack:
+            (start, revision) = stack.pop()
+            if start in visited:
+                logging.warning('xref loop detected: pos=%r' % start)
+                continue
+            if self.XREF_MAX_CHAIN <= len(visited):
+                raise PDFNoValidXRef('Too many xrefs: %d' % len(visited))
+            visited.add(start)
+            t0 = time.time()
+            xref = self.read_xref_section(parser, start)
+            self.xref_stats.append((start, xref, time.time()-t0))
+            xref.revision = revision
+            xrefs.append(xref)
+            trailer = xref.get_trailer()
+            if self.debug:
+                logging.info('trailer: %r' % trailer)
+            if 'Prev' in trailer:
+                # find previous xref
+                if self._is_first_page_xref(parser, start, firstpage):
+                    stack.append((int_value(trailer['Prev']), revision))
+                else:
+                    stack.append((int_value(trailer['Prev']), revision+1))
+            if 'XRefStm' in trailer:
+                stack.append((int_value(trailer['XRefStm']), revision))
+        return
+
+    def _is_first_page_xref(self, parser, start, firstpage):
+        # the first-page xref comes right after the linearization dictionary.
+        if firstpage is None or not (firstpage <= start < firstpage+1024):
+            return False
+        return not parser.read(firstpage, start-firstpage).strip()
+
+    def read_xref_section(self, parser, start):
+        """Reads one XRef at the given location."""
         parser.seek(start)
         parser.reset()
         try:
@@ -792,15 +1384,350 @@ class PDFDocument(object):
                 parser.nextline()
             xref = PDFXRef()
             xref.load(parser)
-        xrefs.append(xref)
-        trailer = xref.get_trailer()
-        if self.debug:
-            logging.info('trailer: %r' % trailer)
-        if 'XRefStm' in trailer:
-            pos = int_value(trailer['XRefStm'])
-            self.read_xref_from(parser, pos, xrefs)
-        if 'Prev' in trailer:
-            # find previous xref
-            pos = int_value(trailer['Prev'])
-            self.read_xref_from(parser, pos, xrefs)
+        return xref
+
+
+import unittest
+
+
+##  Simplistic Test cases
+##
+class TestPDFDocument(unittest.TestCase):
+
+    CONTENTS = b'BT /F1 24 Tf 72 700 Td (Hello World wrong length) Tj ET'
+
+    def make_pdf(self, objs, trailer=b'', eol=b'\n'):
+        """Returns a PDF file with the given objects and a valid xref."""
+        data = b'%PDF-1.4' + eol
+        offsets = []
+        for (i, obj) in enumerate(objs):
+            offsets.append(len(data))
+            data += b'%d 0 obj' % (i+1) + eol + obj + eol + b'endobj' + eol
+        start = len(data)
+        data += b'xref' + eol + b'0 %d' % (len(objs)+1) + eol
+        data += b'0000000000 65535 f' + eol
+        for pos in offsets:
+            data += b'%010d 00000 n' % pos + eol
+        data += (b'trailer' + eol + b'<< /Size %d /Root 1 0 R %s >>' % (len(objs)+1, trailer) +
+                 eol + b'startxref' + eol + b'%d' % start + eol + b'%EOF' + eol)
+        return data
+
+    def make_page(self, contents, length, eol=b'\n'):
+        return self.make_pdf([
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>',
+            b'<< /Length %d >>' % length + eol + b'stream' + eol + contents + eol + b'endstream',
+        ], eol=eol)
+
+    def make_update(self, data, objs, root=1, eol=b'\n'):
+        """Appends an incremental update with the given {objid: object}."""
+        prev = int(data[data.rindex(b'startxref')+9:].split()[0])
+        size = 1+max(int(x) for x in re.findall(br'(\d+) 0 obj', data)+list(objs))
+        offsets = {}
+        for objid in sorted(objs):
+            offsets[objid] = len(data)
+            data += b'%d 0 obj' % objid + eol + objs[objid] + eol + b'endobj' + eol
+        start = len(data)
+        data += b'xref' + eol
+        for objid in sorted(objs):
+            data += b'%d 1' % objid + eol + b'%010d 00000 n' % offsets[objid] + eol
+        data += (b'trailer' + eol + b'<< /Size %d /Root %d 0 R /Prev %d >>' % (size, root, prev) +
+                 eol + b'startxref' + eol + b'%d' % start + eol + b'%EOF' + eol)
+        return data
+
+    def make_objstm(self, objs):
+        """Returns an ObjStm with the given [(objid, object)]."""
+        (header, body) = (b'', b'')
+        for (objid, obj) in objs:
+            header += b'%d %d ' % (objid, len(body))
+            body += obj + b'\n'
+        return (b'<< /Type /ObjStm /N %d /First %d /Length %d >>\nstream\n' %
+                (len(objs), len(header), len(header)+len(body)) +
+                header + body + b'\nendstream')
+
+    def read_sample(self, name):
+        import os.path
+        path = os.path.join(os.path.dirname(__file__), '..', 'samples', name)
+        fp = open(path, 'rb')
+        try:
+            return fp.read()
+        finally:
+            fp.close()
+
+    def open_document(self, data, **kwargs):
+        from io import BytesIO
+        from .pdfparser import PDFParser
+        return PDFDocument(PDFParser(BytesIO(data)), **kwargs)
+
+    def test_1(self):
+        # the data is found even if /Length is too short or too long.
+        n = len(self.CONTENTS)
+        for eol in (b'\n', b'\r\n', b'\r'):
+            for length in (0, 20, n-1, n, n+5, 100, 10000):
+                doc = self.open_document(self.make_page(self.CONTENTS, length, eol=eol))
+                self.assertEqual(doc.getobj(4).get_data(), self.CONTENTS, (eol, length))
+                # the objects after the stream are still read.
+                self.assertEqual(doc.getobj(3)['Type'], LIT('Page'))
+            # a /Length that ends right before endstream is kept.
+            doc = self.open_document(self.make_page(self.CONTENTS, n+len(eol), eol=eol))
+            self.assertEqual(doc.getobj(4).get_data(), self.CONTENTS+eol)
         return
+
+    def test_2(self):
+        data = self.make_page(self.CONTENTS, len(self.CONTENTS))
+        # a valid xref is used as it is.
+        count = PDFDocument.fallback_count
+        doc = self.open_document(data)
+        self.assertEqual(PDFDocument.fallback_count, count)
+        self.assertFalse(isinstance(doc.xrefs[0], PDFXRefFallback))
+        self.assertFalse(doc._parser.fallback)
+        doc.validate_xrefs(doc._parser)
+        # the whole file is scanned when the offsets are wrong,
+        broken = data.replace(b'%PDF-1.4\n', b'%PDF-1.4\n%garbage\n', 1)
+        # when startxref is wrong,
+        nostart = data.replace(b'startxref\n', b'startxref\n1', 1)
+        for data1 in (broken, nostart):
+            doc = self.open_document(data1)
+            self.assertEqual(PDFDocument.fallback_count, count+1)
+            count += 1
+            self.assertTrue(isinstance(doc.xrefs[0], PDFXRefFallback))
+            # /Length is not used, and the data runs up to endstream.
+            self.assertEqual(doc.getobj(4).get_data(), self.CONTENTS+b'\n')
+            self.assertEqual(doc.catalog['Type'], LIT('Catalog'))
+        # or when it is asked to, after the xrefs of the file.
+        doc = self.open_document(data, fallback=True)
+        self.assertEqual(PDFDocument.fallback_count, count+1)
+        self.assertTrue(isinstance(doc.xrefs[-1], PDFXRefFallback))
+        self.assertTrue(doc._parser.fallback)
+        return
+
+    def test_3(self):
+        doc = self.open_document(self.make_page(self.CONTENTS, len(self.CONTENTS)))
+        parser = doc._parser
+        xref = doc.xrefs[0]
+        # no /Root in the trailers.
+        doc.xrefs = [PDFXRef()]
+        self.assertRaises(PDFNoValidXRef, doc.validate_xrefs, parser)
+        # /Root is not in the xref.
+        xref1 = PDFXRef()
+        xref1.trailer = xref.trailer
+        doc.xrefs = [xref1]
+        self.assertRaises(PDFNoValidXRef, doc.validate_xrefs, parser)
+        # /Root points to another object.
+        xref1.set_pos(1, xref.get_pos(2)[1], 0)
+        self.assertRaises(PDFNoValidXRef, doc.validate_xrefs, parser)
+        xref1.set_pos(1, xref.get_pos(1)[1], 0)
+        doc.validate_xrefs(parser)
+        return
+
+    def test_4(self):
+        # an incrementally updated file.
+        data = self.make_pdf([
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            b'<< /Type /Pages /Kids [] /Count 0 >>',
+        ])
+        data = self.make_update(data, {3: b'<< /Title (A) >>'})
+        data = self.make_update(data, {3: b'<< /Title (B) >>', 4: b'(new)'})
+        doc = self.open_document(data)
+        self.assertEqual(doc.revisions, 3)
+        self.assertEqual(doc.getobj(3)['Title'], b'B')
+        self.assertEqual(doc.getobj(4), b'new')
+        for (revision, title) in ((1, b'A'), (2, b'B')):
+            doc = self.open_document(data, revision=revision)
+            self.assertEqual(doc.getobj(3)['Title'], title)
+        doc = self.open_document(data, revision=0)
+        self.assertRaises(PDFObjectNotFound, doc.getobj, 3)
+        self.assertRaises(PDFObjectNotFound, doc.getobj, 4)
+        self.assertEqual(doc.catalog['Type'], LIT('Catalog'))
+        self.assertRaises(PDFException, self.open_document, data, revision=3)
+        return
+
+    def test_5(self):
+        # a linearized file has one revision, even though its
+        # first-page xref points to the main xref with Prev.
+        data = self.read_sample('nonfree/dmca.pdf')
+        for linearized in (False, True):
+            doc = self.open_document(data, linearized=linearized)
+            doc.getobj(1)
+            self.assertEqual(doc.revisions, 1)
+        pages = doc.catalog['Pages'].objid
+        doc = self.open_document(data, revision=0)
+        self.assertEqual(doc.catalog['Pages'].objid, pages)
+        self.assertEqual(doc.getobj(1)['Type'], LIT('Page'))
+        # an update of a linearized file is a new revision.
+        data = self.make_update(data, {100: b'<< /Type /Catalog /Pages %d 0 R /Lang (x) >>' % pages},
+                                root=100)
+        doc = self.open_document(data)
+        self.assertEqual(doc.revisions, 2)
+        self.assertEqual(doc.catalog['Lang'], b'x')
+        doc = self.open_document(data, revision=0)
+        self.assertFalse('Lang' in doc.catalog)
+        self.assertRaises(PDFObjectNotFound, doc.getobj, 100)
+        return
+
+    def test_6(self):
+        # an objid put aside is still found after the arrays grow past it.
+        xref = PDFXRef()
+        for objid in (5, 70000, 60000, 70005):
+            xref.set_pos(objid, objid*10, 1)
+        for objid in (5, 70000, 60000, 70005):
+            self.assertEqual(xref.get_pos(objid), (None, objid*10, 1))
+        self.assertEqual(sorted(xref.get_objids()), [5, 60000, 70000, 70005])
+        self.assertEqual(xref.sparse, {})
+        self.assertRaises(KeyError, xref.get_pos, 6)
+        self.assertRaises(KeyError, xref.get_pos, 200000)
+        xref.set_pos(200000, 1, 0)
+        self.assertEqual(xref.get_pos(200000), (None, 1, 0))
+        self.assertEqual(len(xref.positions), 70006)
+        return
+
+    def test_7(self):
+        # the same for the index of the xrefs.
+        index = PDFXRefIndex([PDFXRef(), PDFXRef()])
+        for (objid, i) in ((5, 0), (70000, 1), (60000, 0), (70005, 1)):
+            index.set(objid, i)
+        for (objid, i) in ((5, 0), (70000, 1), (60000, 0), (70005, 1)):
+            self.assertEqual(index.find(objid), i)
+        self.assertEqual(index.sparse, {})
+        self.assertEqual(index.find(6), 2)
+        self.assertEqual(index.find(200000), 2)
+        return
+
+    def test_8(self):
+        # a file without any xref is recovered by scanning it.
+        data = self.make_pdf([
+            b'<< /Type /Catalog /Pages 5 0 R >>',
+            self.make_objstm([
+                (5, b'<< /Type /Pages /Kids [6 0 R] /Count 1 >>'),
+                (6, b'<< /Type /Page /Parent 5 0 R /MediaBox [0 0 612 792] /Contents 3 0 R >>'),
+            ]),
+            b'<< /Length %d >>\nstream\n%s\nendstream' % (len(self.CONTENTS), self.CONTENTS),
+            # an object header within a stream is not an object.
+            b'<< /Length 20 >>\nstream\n\n9 0 obj\n(fake)\nendobj\nendstream',
+        ])
+        data = data[:data.index(b'xref')] + b'trailer\n<< /Size 7 /Root 1 0 R >>\n%EOF\n'
+        doc = self.open_document(data, fallback=True)
+        xref = doc.xrefs[-1]
+        self.assertTrue(isinstance(xref, PDFXRefFallback))
+        self.assertEqual(sorted(xref.offsets), [1, 2, 3, 4])
+        self.assertEqual(xref.get_trailer()['Size'], 7)
+        # the ObjStm is read only when an object is not found otherwise.
+        self.assertEqual(doc.catalog['Type'], LIT('Catalog'))
+        self.assertEqual(doc.getobj(3).get_data(), self.CONTENTS+b'\n')
+        self.assertEqual(list(xref.objstms), [2])
+        self.assertEqual(doc.getobj(6)['Type'], LIT('Page'))
+        self.assertEqual(list(xref.objstms), [])
+        self.assertEqual(xref.get_pos(5), (2, 0, 0))
+        self.assertEqual(xref.get_pos(6), (2, 1, 0))
+        self.assertEqual(doc.getobj(5)['Count'], 1)
+        self.assertEqual(sorted(xref.get_objids()), [1, 2, 3, 4, 5, 6])
+        self.assertRaises(PDFObjectNotFound, doc.getobj, 9)
+        return
+
+    def test_9(self):
+        # an object is read from an ObjStm without parsing the others.
+        data = self.make_pdf([
+            b'<< /Type /Catalog >>',
+            self.make_objstm([
+                (4, b'] >> (broken'),
+                (3, b'<< /A 1 >>'),
+            ]),
+        ])
+        data = data[:data.index(b'xref')] + b'trailer\n<< /Size 5 /Root 1 0 R >>\n%EOF\n'
+        doc = self.open_document(data, fallback=True)
+        self.assertEqual(doc.getobj(3), {'A': 1})
+        self.assertRaises(KeyError, doc.cache.get, 4)
+        (index, _) = doc.cache.get(('objstm', 2))
+        self.assertEqual([objid for (objid, _) in index], [4, 3])
+        # a bad index is not an object.
+        stream = doc.getobj(2)
+        self.assertRaises(PDFSyntaxError, doc._getobj_objstm, stream, 2, 3)
+        doc.xrefs[-1].offsets[5] = (2, 2, 0)
+        self.assertRaises(PDFObjectNotFound, doc.getobj, 5)
+        return
+
+    def get_page_attrs(self, page):
+        return (page.pageid, page.mediabox, page.cropbox, page.rotate,
+                sorted(page.resources), repr(page.contents))
+
+    def test_10(self):
+        # every page of a linearized file is found as in the page tree.
+        from .pdfpage import PDFPage
+        for name in ('nonfree/dmca.pdf', 'nonfree/i1040nr.pdf'):
+            data = self.read_sample(name)
+            pages = [self.get_page_attrs(page) for page in
+                     PDFPage.create_pages(self.open_document(data))]
+            doc = self.open_document(data, linearized=True)
+            self.assertEqual(int_value(doc.linearized['N']), len(pages))
+            for (pageno, attrs) in enumerate(pages):
+                self.assertEqual(doc.find_page(pageno), attrs[0], (name, pageno))
+                page = PDFPage.get_page(self.open_document(data, linearized=True), pageno)
+                self.assertEqual(self.get_page_attrs(page), attrs, (name, pageno))
+            self.assertEqual(doc.find_page(len(pages)), None)
+        return
+
+    def test_11(self):
+        # a broken hint stream makes pages be found in the page tree.
+        from io import BytesIO
+        from .pdfpage import PDFPage
+        data = self.read_sample('nonfree/i1040nr.pdf')
+        pageids = [page.pageid for page in PDFPage.get_pages(BytesIO(data))]
+        i = data.index(b'stream\r\n', 1796)+8
+        garbled = data[:i] + b'\0'*40 + data[i+40:]
+        misplaced = data.replace(b'/H [ 1796 ', b'/H [ 1000 ', 1)
+        for data1 in (garbled, misplaced):
+            doc = self.open_document(data1, linearized=True)
+            self.assertEqual(doc.find_page(0), pageids[0])
+            self.assertEqual(doc.find_page(3), None)
+            pages = PDFPage.get_pages(BytesIO(data1), pagenos=set([0, 3, 7]))
+            self.assertEqual([page.pageid for page in pages], [pageids[0], pageids[3], pageids[7]])
+        return
+
+    def test_12(self):
+        # a page is the object at the start of its range, if it is a page.
+        data = self.read_sample('nonfree/dmca.pdf')
+        doc = self.open_document(data, linearized=True)
+        hints = doc._get_page_hints()
+        linpos = re.search(br'\d+ 0 obj\s*<<\s*/Linearized', data).start()
+        doc._page_hints = [hints[0], (linpos, hints[1][1]), hints[2]]
+        self.assertEqual(doc.find_page(1), None)
+        from .pdfpage import PDFPage
+        pages = list(PDFPage.create_pages(self.open_document(data)))
+        self.assertEqual(doc.find_page(2), pages[2].pageid)
+        # headers within a stream are not objects.
+        doc._hintxref = PDFXRef()
+        objs = (b'1 0 obj\n<< /Length 9 >>stream\n\n77 0 obj\nendstream\n'
+                b'endobj\n5 0 obj\n(x)\nendobj\n')
+        doc._register_objects(1000, objs)
+        self.assertEqual(sorted(doc._hintxref.get_objids()), [1, 5])
+        self.assertEqual(doc._hintxref.get_pos(5), (None, 1000+objs.index(b'5 0 obj'), 0))
+        return
+
+    def test_13(self):
+        # the offsets of an ObjStm are kept in the parse cache.
+        import shutil
+        import tempfile
+        from .pdfcache import PDFParseCache
+        data = self.make_pdf([
+            b'<< /Type /Catalog /Pages 5 0 R >>',
+            self.make_objstm([(5, b'<< /Type /Pages /Kids [] /Count 0 >>'), (6, b'(six)')]),
+        ])
+        data = data[:data.index(b'xref')] + b'trailer\n<< /Size 7 /Root 1 0 R >>\n%EOF\n'
+        tmpdir = tempfile.mkdtemp()
+        try:
+            parsecache = PDFParseCache(tmpdir)
+            for parsed in (1, 0):
+                doc = self.open_document(data, fallback=True, parsecache=parsecache)
+                calls = []
+                get_objstm_index = doc._get_objstm_index
+                doc._get_objstm_index = lambda stream: calls.append(stream) or get_objstm_index(stream)
+                self.assertEqual(doc.getobj(6), b'six')
+                self.assertEqual(doc.getobj(5)['Count'], 0)
+                self.assertEqual(len(calls), parsed)
+        finally:
+            shutil.rmtree(tmpdir)
+        return
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,6 @@ from .cmapdb import CMap
 from .encodingdb import EncodingDB
 from .encodingdb import name2unicode
 from .psparser import PSStackParser
-from .psparser import PSEOF
 from .psparser import LIT
 from .psparser import KWD
 from .psparser import STRICT
@@ -109,11 +108,7 @@ class Type1FontHeaderParser(PSStackParser):
         return
 
     def get_encoding(self):
-        while 1:
-            try:
-                (cid, name) = self.nextobject()
-            except PSEOF:
-                break
+        for (cid, name) in self.iterobjects():
             try:
                 self._cid2unicode[cid] = name2unicode(name)
             except KeyError:
@@ -624,13 +619,19 @@ class PDFFont(object):
 
     def _parse_unicode_map(self, strm):
         unicode_map = FileUnicodeMap()
-        CMapParser(unicode_map, BytesIO(strm.get_data())).run()
+        CMapParser(unicode_map, strm.get_data()).run()
         return unicode_map
 
+    def _get_unicode_map(self, rsrcmgr, kind, strm, create):
+        # the resource manager may have it in its parse cache.
+        if rsrcmgr is None:
+            return create(strm)
+        return rsrcmgr.get_unicode_map(kind, strm, create)
+
 # PDFSimpleFont
 class PDFSimpleFont(PDFFont):
 
-    def __init__(self, descriptor, widths, spec):
+    def __init__(self, descriptor, widths, spec, rsrcmgr=None):
         # Font encoding is specified either by a name of
         # built-in encoding or a dictionary that describes
         # the differences.
@@ -648,7 +649,8 @@ class PDFSimpleFont(PDFFont):
             self.cid2unicode = EncodingDB.get_encoding(literal_name(encoding))
         self.unicode_map = None
         if 'ToUnicode' in spec:
-            self.unicode_map = self._parse_unicode_map(stream_value(spec['ToUnicode']))
+            self.unicode_map = self._get_unicode_map(
+                rsrcmgr, 'tounicode', stream_value(spec['ToUnicode']), self._parse_unicode_map)
         PDFFont.__init__(self, descriptor, widths, spec)
         return
 
@@ -690,7 +692,7 @@ class PDFType1Font(PDFSimpleFont):
         except KeyError:
             descriptor = dict_value(spec.get('FontDescriptor', {}))
             widths = self._resolve_widths(spec)
-        PDFSimpleFont.__init__(self, descriptor, widths, spec)
+        PDFSimpleFont.__init__(self, descriptor, widths, spec, rsrcmgr)
         if 'Encoding' not in spec:
             if 'FontFile' in descriptor:
                 # try to recover the missing encoding info from the font file.
@@ -701,9 +703,12 @@ class PDFType1Font(PDFSimpleFont):
                 self.cid2unicode = parser.get_encoding()
             elif not self.unicode_map and 'FontFile2' in descriptor:
                 self.fontfile = stream_value(descriptor.get('FontFile2'))
-                ttf = TrueTypeFont(self.basefont, BytesIO(self.fontfile.get_data()))
+                def create(strm):
+                    ttf = TrueTypeFont(self.basefont, BytesIO(strm.get_data()))
+                    return ttf.create_unicode_map()
                 try:
-                    self.unicode_map = ttf.create_unicode_map()
+                    self.unicode_map = self._get_unicode_map(
+                        rsrcmgr, 'truetype', self.fontfile, create)
                 except TrueTypeFont.CMapNotFound:
                     pass
             elif 'FontFile3' in descriptor:
@@ -741,7 +746,7 @@ class PDFType3Font(PDFSimpleFont):
             else:
                 descriptor['FontName'] = self._make_unique_name("font")
 
-        PDFSimpleFont.__init__(self, descriptor, widths, spec)
+        PDFSimpleFont.__init__(self, descriptor, widths, spec, rsrcmgr)
         self.matrix = tuple(list_value(spec.get('FontMatrix')))
         (_, self.descent, _, self.ascent) = self.bbox
         # (self.hscale, self.vscale) = apply_matrix_norm(self.matrix, (1, 1))
@@ -799,11 +804,13 @@ class PDFCIDFont(PDFFont):
             # cff = CFFFont(self.basefont, BytesIO(self.fontfile.get_data()))
         self.unicode_map = None
         if 'ToUnicode' in spec:
-            self.unicode_map = self._parse_unicode_map(stream_value(spec['ToUnicode']))
+            self.unicode_map = self._get_unicode_map(
+                rsrcmgr, 'tounicode', stream_value(spec['ToUnicode']), self._parse_unicode_map)
         elif self.cidcoding in ('Adobe-Identity', 'Adobe-UCS'):
             if ttf:
                 try:
-                    self.unicode_map = ttf.create_unicode_map()
+                    self.unicode_map = self._get_unicode_map(
+                        rsrcmgr, 'truetype', self.fontfile, lambda _: ttf.create_unicode_map())
                 except TrueTypeFont.CMapNotFound:
                     pass
             elif cff:
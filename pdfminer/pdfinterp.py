@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 import re
 import logging
-from io import BytesIO
 from .cmapdb import CMapDB
 from .cmapdb import CMap
 from .psparser import PSTypeError
@@ -150,8 +149,9 @@ class PDFResourceManager(object):
 
     debug = False
 
-    def __init__(self, caching=True):
+    def __init__(self, caching=True, parsecache=None):
         self.caching = caching
+        self.parsecache = parsecache
         self._cached_fonts = {}
         return
 
@@ -174,6 +174,21 @@ class PDFResourceManager(object):
                 raise
             return CMap()
 
+    def get_unicode_map(self, kind, strm, create):
+        """Returns a Unicode map made of a font stream by create(strm).
+
+        With a PDFParseCache, the map is stored on disk by the digest
+        of the stream's raw data and reused from there.
+        """
+        if self.parsecache is None:
+            return create(strm)
+        key = self.parsecache.getstreamkey(kind, strm)
+        unicode_map = self.parsecache.load(key)
+        if unicode_map is None:
+            unicode_map = create(strm)
+            self.parsecache.save(key, unicode_map)
+        return unicode_map
+
     def get_font(self, objid, spec):
         if objid and objid in self._cached_fonts:
             font = self._cached_fonts[objid]
@@ -220,6 +235,63 @@ class PDFResourceManager(object):
         return font
 
 
+##  PDFResourceMap
+##
+class PDFResourceMap(dict):
+
+    """A dictionary of resources that are made on first lookup.
+
+    An entry added with add() keeps its spec, which is turned into
+    the resource by func(key, spec) when the entry is looked up.
+    The keys are in the same order as in a plain dictionary.
+    """
+
+    def __init__(self, func, *args):
+        dict.__init__(self, *args)
+        self.func = func
+        self.specs = {}
+        return
+
+    def add(self, key, spec):
+        self.specs[key] = spec
+        dict.__setitem__(self, key, None)
+        return
+
+    def __getitem__(self, key):
+        if key in self.specs:
+            value = self.func(key, self.specs[key])
+            del self.specs[key]
+            dict.__setitem__(self, key, value)
+            return value
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        self.specs.pop(key, None)
+        dict.__setitem__(self, key, value)
+        return
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def itervalues(self):
+        for key in self.keys():
+            yield self[key]
+        return
+
+    def iteritems(self):
+        for key in self.keys():
+            yield (key, self[key])
+        return
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+
 ##  PDFContentParser
 ##
 class PDFContentParser(PSStackParser):
@@ -237,7 +309,7 @@ class PDFContentParser(PSStackParser):
                 self.istream += 1
             else:
                 raise PSEOF('Unexpected EOF, file truncated?')
-            self.fp = BytesIO(strm.get_data())
+            self.fp = strm.open()
         return
 
     def seek(self, pos):
@@ -255,6 +327,10 @@ class PDFContentParser(PSStackParser):
             if self.buf:
                 break
             self.fp = None
+            if self.istream < len(self.streams):
+                # a token does not continue into the next stream.
+                self.buf = b'\n'
+                break
         self.charpos = 0
         return
 
@@ -325,9 +401,27 @@ class PDFPageInterpreter(object):
     debug = 0
     exec_logger_filter = []
 
+    # The operators that only matter for drawing text, images or
+    # graphics (paths and colors). The operators of what the device
+    # does not draw (PDFDevice.capabilities) do nothing.
+    OPERATORS = {
+        'text': ('BT', 'ET', 'Tc', 'Tw', 'Tz', 'TL', 'Tf', 'Tr', 'Ts',
+                 'Td', 'TD', 'Tm', 'T*', 'TJ', 'Tj', "'", '"'),
+        'image': ('EI',),
+        'graphics': ('w', 'J', 'j', 'M', 'd', 'ri', 'i',
+                     'm', 'l', 'c', 'v', 'y', 'h', 're',
+                     'S', 's', 'f', 'F', 'f*', 'B', 'B*', 'b', 'b*', 'n', 'W', 'W*',
+                     'CS', 'cs', 'G', 'g', 'RG', 'rg', 'K', 'k',
+                     'SC', 'SCN', 'sc', 'scn', 'sh'),
+    }
+    # these take as many operands as the color space has components.
+    COLOR_OPERATORS = ('SC', 'SCN', 'sc', 'scn')
+
     def __init__(self, rsrcmgr, device):
         self.rsrcmgr = rsrcmgr
         self.device = device
+        self.skip = frozenset(kind for kind in self.OPERATORS
+                              if kind not in device.capabilities)
         return
 
     def dup(self):
@@ -335,50 +429,59 @@ class PDFPageInterpreter(object):
 
     # init_resources(resources):
     #   Prepare the fonts and XObjects listed in the Resource attribute.
+    #   Fonts, color spaces and XObjects are made when they are first used.
     def init_resources(self, resources):
         self.resources = resources
-        self.fontmap = {}
-        self.xobjmap = {}
-        self.csmap = PREDEFINED_COLORSPACE.copy()
+        self.fontmap = PDFResourceMap(self.get_font)
+        self.xobjmap = PDFResourceMap(self.get_xobject)
+        self.csmap = PDFResourceMap(self.get_colorspace, PREDEFINED_COLORSPACE)
         if not resources:
             return
-
-        def get_colorspace(spec):
-            if isinstance(spec, list):
-                name = literal_name(spec[0])
-            else:
-                name = literal_name(spec)
-            if name == 'ICCBased' and isinstance(spec, list) and 2 <= len(spec):
-                return PDFColorSpace(name, stream_value(spec[1])['N'])
-            elif name == 'DeviceN' and isinstance(spec, list) and 2 <= len(spec):
-                return PDFColorSpace(name, len(list_value(spec[1])))
-            else:
-                return PREDEFINED_COLORSPACE.get(name)
         for (k, v) in dict_value(resources).iteritems():
             if self.debug:
                 logger.debug('Resource: %r: %r' % (k, v))
             if k == 'Font':
                 for (fontid, spec) in dict_value(v).iteritems():
-                    objid = None
-                    if isinstance(spec, PDFObjRef):
-                        objid = spec.objid
-                    spec = dict_value(spec)
-                    self.fontmap[fontid] = self.rsrcmgr.get_font(objid, spec)
+                    self.fontmap.add(fontid, spec)
             elif k == 'ColorSpace':
                 for (csid, spec) in dict_value(v).iteritems():
-                    self.csmap[csid] = get_colorspace(resolve1(spec))
+                    self.csmap.add(csid, spec)
             elif k == 'ProcSet':
                 self.rsrcmgr.get_procset(list_value(v))
             elif k == 'XObject':
                 for (xobjid, xobjstrm) in dict_value(v).iteritems():
-                    self.xobjmap[xobjid] = xobjstrm
+                    self.xobjmap.add(xobjid, xobjstrm)
         return
 
+    def get_font(self, fontid, spec):
+        objid = None
+        if isinstance(spec, PDFObjRef):
+            objid = spec.objid
+        spec = dict_value(spec)
+        return self.rsrcmgr.get_font(objid, spec)
+
+    def get_colorspace(self, csid, spec):
+        spec = resolve1(spec)
+        if isinstance(spec, list):
+            name = literal_name(spec[0])
+        else:
+            name = literal_name(spec)
+        if name == 'ICCBased' and isinstance(spec, list) and 2 <= len(spec):
+            return PDFColorSpace(name, stream_value(spec[1])['N'])
+        elif name == 'DeviceN' and isinstance(spec, list) and 2 <= len(spec):
+            return PDFColorSpace(name, len(list_value(spec[1])))
+        else:
+            return PREDEFINED_COLORSPACE.get(name)
+
+    def get_xobject(self, xobjid, spec):
+        return stream_value(spec)
+
     # init_state(ctm)
     #   Initialize the text and graphic states for rendering a page.
     def init_state(self, ctm):
         if self.csmap:
-            default_cs = self.csmap.values()[0]
+            # only the first color space is made.
+            default_cs = self.csmap[iter(self.csmap).next()]
         else:
             default_cs = None
 
@@ -406,11 +509,18 @@ class PDFPageInterpreter(object):
         if n == 0:
             return []
         x = self.argstack[-n:]
-        self.argstack = self.argstack[:-n]
+        del self.argstack[-n:]
         return x
 
     def get_current_state(self):
-        return (self.ctm, self.textstate.copy(), self.graphicstate.copy())
+        # a state that only skipped operators change is not copied.
+        textstate = self.textstate
+        if 'text' not in self.skip:
+            textstate = textstate.copy()
+        graphicstate = self.graphicstate
+        if 'graphics' not in self.skip:
+            graphicstate = graphicstate.copy()
+        return (self.ctm, textstate, graphicstate)
 
     def set_current_state(self, state):
         (self.ctm, self.textstate, self.graphicstate) = state
@@ -821,7 +931,7 @@ class PDFPageInterpreter(object):
     def do_Do(self, xobjid):
         xobjid = literal_name(xobjid)
         try:
-            xobj = stream_value(self.xobjmap[xobjid])
+            xobj = self.xobjmap[xobjid]
         except KeyError:
             if STRICT:
                 raise PDFInterpreterError('Undefined xobject id: %r' % xobjid)
@@ -835,11 +945,18 @@ class PDFPageInterpreter(object):
             # According to PDF reference 1.7 section 4.9.1, XObjects in
             # earlier PDFs (prior to v1.2) use the page's Resources entry
             # instead of having their own Resources entry.
-            resources = dict_value(xobj.get('Resources')) or self.resources.copy()
+            resources = dict_value(xobj.get('Resources'))
+            if self.device.reuse_figure(xobjid, bbox, matrix, xobj,
+                                        resources or self.resources,
+                                        self.get_form_state()):
+                return
+            resources = resources or self.resources.copy()
             self.device.begin_figure(xobjid, bbox, matrix)
             interpreter.render_contents(resources, [xobj], ctm=mult_matrix(matrix, self.ctm))
             self.device.end_figure(xobjid)
         elif subtype is LITERAL_IMAGE and 'Width' in xobj and 'Height' in xobj:
+            if 'image' in self.skip:
+                return
             self.device.begin_figure(xobjid, (0, 0, 1, 1), MATRIX_IDENTITY)
             self.device.render_image(xobjid, xobj)
             self.device.end_figure(xobjid)
@@ -848,6 +965,20 @@ class PDFPageInterpreter(object):
             pass
         return
 
+    # get_form_state()
+    #   Returns the text and graphic states that a form is drawn in,
+    #   as a key for reusing its layout. Forms are rendered from a
+    #   fresh state by render_contents() for now, but a PDF form
+    #   inherits them, so a reused layout must not depend on that.
+    def get_form_state(self):
+        ts = self.textstate
+        gs = self.graphicstate
+        return (ts.font, repr((ts.fontsize, ts.charspace, ts.wordspace, ts.scaling,
+                               ts.leading, ts.render, ts.rise, ts.matrix, ts.linematrix,
+                               gs.linewidth, gs.linecap, gs.linejoin, gs.miterlimit,
+                               gs.dash, gs.intent, gs.flatness)),
+                gs.color.cs, repr(gs.color.clr), gs.ncolor.cs, repr(gs.ncolor.clr))
+
     def process_page(self, page):
         if self.debug: logger.info('Processing page: %r' % page)
         (x0, y0, x1, y1) = page.mediabox
@@ -877,44 +1008,336 @@ class PDFPageInterpreter(object):
         self.execute(list_value(streams))
         return
 
+    # get_operators(skip)
+    #   Returns the table of handlers for a class and a set of skipped
+    #   kinds of operators. It is filled by get_operator().
+    @classmethod
+    def get_operators(klass, skip=frozenset()):
+        tables = klass.__dict__.get('_operators')
+        if tables is None:
+            tables = {}
+            setattr(klass, '_operators', tables)
+        table = tables.get(skip)
+        if table is None:
+            table = tables[skip] = {}
+        return table
+
+    # get_operator(token, skip)
+    #   Returns the handler of an operator and its number of arguments,
+    #   or None. The handlers are looked up once for each class;
+    #   unknown operators are not remembered.
+    @classmethod
+    def get_operator(klass, token, skip=frozenset()):
+        table = klass.get_operators(skip)
+        try:
+            return table[token]
+        except KeyError:
+            pass
+        name = keyword_name(token)
+        method = 'do_%s' % name.replace('*', '_a').replace('"', '_w').replace("'", '_q')
+        func = getattr(klass, method, None)
+        if func is None:
+            return None
+        func = getattr(func, 'im_func', func)
+        op = (func, func.func_code.co_argcount-1)
+        if any(name in klass.OPERATORS[kind] for kind in skip):
+            if name in klass.COLOR_OPERATORS:
+                op = (klass.skip_color.im_func, 0)
+            else:
+                op = (klass.skip_operator.im_func, op[1])
+        table[token] = op
+        return op
+
+    # handlers of skipped operators.
+    def skip_operator(self, *args):
+        return
+
+    def skip_color(self):
+        # the color space is not kept, so all the operands are dropped.
+        del self.argstack[:]
+        return
+
+    # The parsed contents of a form are kept in the document's cache
+    # so that a form drawn many times is parsed only once.
+    # Contents with more objects than this are not kept.
+    MAX_CACHED_OBJS = 100000
+
+    def get_contents_key(self, streams):
+        if len(streams) != 1:
+            return None
+        strm = streams[0]
+        if not isinstance(strm, PDFStream) or strm.cache is None or strm.objid is None:
+            return None
+        if strm.get('Subtype') is not LITERAL_FORM:
+            return None
+        return ('contents', strm.objid, strm.genno)
+
     def execute(self, streams):
+        key = self.get_contents_key(streams)
+        if key is not None:
+            cache = streams[0].cache
+            try:
+                objs = cache.get(key)
+            except KeyError:
+                pass
+            else:
+                self.execute_objects(objs)
+                return
         try:
             parser = PDFContentParser(streams)
         except PSEOF:
             # empty page
-            return
-        while 1:
+            objs = []
+        else:
+            if key is None:
+                self.execute_objects(obj for (_, obj) in parser.iterobjects())
+                return
+            objs = []
+            self.execute_objects(self._record_objects(parser, objs))
+        if key is not None and len(objs) <= self.MAX_CACHED_OBJS:
+            cache.put(key, objs, 64+32*len(objs))
+        return
+
+    def _record_objects(self, parser, objs):
+        for (_, obj) in parser.iterobjects():
+            objs.append(obj)
+            yield obj
+        return
+
+    def execute_objects(self, objs):
+        operators = self.get_operators(self.skip)
+        for obj in objs:
+            if not isinstance(obj, PSKeyword):
+                self.argstack.append(obj)
+                continue
             try:
-                (_, obj) = parser.nextobject()
-            except PSEOF:
-                break
-            if isinstance(obj, PSKeyword):
+                op = operators[obj]
+            except KeyError:
+                op = self.get_operator(obj, self.skip)
+            if op is None:
                 name = keyword_name(obj)
-                method = 'do_%s' % name.replace('*', '_a').replace('"', '_w').replace("'", '_q')
-                if hasattr(self, method):
-                    func = getattr(self, method)
-                    nargs = func.func_code.co_argcount-1
-                    if nargs:
-                        args = self.pop(nargs)
-                        if self.debug and name not in self.exec_logger_filter:
-                            logger.debug('exec-n: %s %r' % (name, args))
-                        if len(args) == nargs:
-                            func(*args)
-                    else:
-                        args = self.argstack[:]
-                        # if self.debug:
-                        #     logger.debug('exec: %s' % name)
-                        func()
-                        if self.debug and name not in self.exec_logger_filter:
-                            if len(args) > len(self.argstack):
-                                logger.debug('exec: %s %r' % (name, args[len(self.argstack):]))
-                            else:
-                                logger.debug('exec: %s' % name)
+                if STRICT:
+                    raise PDFInterpreterError('Unknown operator: %r' % name)
                 else:
-                    if STRICT:
-                        raise PDFInterpreterError('Unknown operator: %r' % name)
+                    logger.debug('Unknown operator: %r' % name)
+                continue
+            (func, nargs) = op
+            if nargs:
+                argstack = self.argstack
+                args = argstack[-nargs:]
+                del argstack[-nargs:]
+                if self.debug and keyword_name(obj) not in self.exec_logger_filter:
+                    logger.debug('exec-n: %s %r' % (keyword_name(obj), args))
+                if len(args) == nargs:
+                    func(self, *args)
+            elif self.debug:
+                name = keyword_name(obj)
+                args = self.argstack[:]
+                func(self)
+                if name not in self.exec_logger_filter:
+                    if len(args) > len(self.argstack):
+                        logger.debug('exec: %s %r' % (name, args[len(self.argstack):]))
                     else:
-                        logger.debug('Unknown operator: %r' % name)
+                        logger.debug('exec: %s' % name)
             else:
-                self.push(obj)
+                func(self)
         return
+
+
+import unittest
+
+
+##  Simplistic Test cases
+##
+class TestPDFPageInterpreter(unittest.TestCase):
+
+    FONT = b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+
+    def make_page(self, contents, resources, objs=(), contentsref=b'4 0 R'):
+        """Returns a one-page PDF file. The given objects are numbered from 5."""
+        objs = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            b'/Contents %s /Resources %s >>' % (contentsref, resources),
+            self.make_stream(b'', contents),
+        ] + list(objs)
+        data = b'%PDF-1.4\n'
+        offsets = []
+        for (i, obj) in enumerate(objs):
+            offsets.append(len(data))
+            data += b'%d 0 obj\n%s\nendobj\n' % (i+1, obj)
+        start = len(data)
+        data += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objs)+1)
+        for pos in offsets:
+            data += b'%010d 00000 n \n' % pos
+        data += (b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n' %
+                 (len(objs)+1, start))
+        return data
+
+    def make_stream(self, attrs, data):
+        return b'<< %s /Length %d >>\nstream\n%s\nendstream' % (attrs, len(data), data)
+
+    def render(self, data, device=None, interpreter=PDFPageInterpreter):
+        """Returns the layout of the page, and the interpreter used."""
+        from io import BytesIO
+        from .pdfparser import PDFParser
+        from .pdfdocument import PDFDocument
+        from .pdfpage import PDFPage
+        from .converter import PDFPageAggregator
+        from .layout import LAParams
+        rsrcmgr = PDFResourceManager()
+        if device is None:
+            device = PDFPageAggregator
+        device = device(rsrcmgr, laparams=LAParams())
+        interp = interpreter(rsrcmgr, device)
+        doc = PDFDocument(PDFParser(BytesIO(data)))
+        for page in PDFPage.create_pages(doc):
+            interp.process_page(page)
+        return (self.get_layout(device.get_result()), interp)
+
+    def get_layout(self, item):
+        from .layout import LTContainer
+        from .layout import LTAnno
+        from .layout import LTText
+        if isinstance(item, LTAnno):
+            return (item.__class__.__name__, item.get_text())
+        bbox = tuple(round(x, 3) for x in item.bbox)
+        if isinstance(item, LTContainer):
+            return (item.__class__.__name__, bbox, [self.get_layout(x) for x in item])
+        elif isinstance(item, LTText):
+            return (item.__class__.__name__, bbox, item.get_text())
+        return (item.__class__.__name__, bbox)
+
+    # a form drawn at two places.
+    FORM = b'BT /F1 12 Tf 10 10 Td (Hi) Tj ET 0 0 50 50 re f'
+    FORM_PAGE = b'q 1 0 0 1 100 100 cm /X1 Do Q q 1 0 0 1 300 400 cm /X1 Do Q'
+
+    def make_form_page(self, contents=FORM_PAGE):
+        return self.make_page(contents, b'<< /XObject << /X1 5 0 R >> >>', [
+            self.make_stream(b'/Type /XObject /Subtype /Form /BBox [0 0 100 100] '
+                             b'/Resources << /Font << /F1 6 0 R >> >>', self.FORM),
+            self.FONT,
+        ])
+
+    def test_1(self):
+        # the parsed contents of a form are kept and replayed.
+        class UncachedInterpreter(PDFPageInterpreter):
+            MAX_CACHED_OBJS = -1
+        data = self.make_form_page()
+        (layout, interp) = self.render(data)
+        stream = interp.xobjmap['X1']
+        objs = [obj for (_, obj) in PDFContentParser([stream]).iterobjects()]
+        self.assertEqual(stream.cache.get(('contents', 5, 0)), objs)
+        (layout1, interp) = self.render(data, interpreter=UncachedInterpreter)
+        stream = interp.xobjmap['X1']
+        self.assertRaises(KeyError, stream.cache.get, ('contents', 5, 0))
+        self.assertEqual(layout, layout1)
+        figures = [item for item in layout[2] if item[0] == 'LTFigure']
+        self.assertEqual([figure[1] for figure in figures],
+                         [(100, 100, 200, 200), (300, 400, 400, 500)])
+        return
+
+    def test_2(self):
+        # a form drawn again gives the same layout when it is reused.
+        from .converter import PDFPageAggregator
+
+        class FigureCachingAggregator(PDFPageAggregator):
+            cache_figures = True
+
+        class CountingInterpreter(PDFPageInterpreter):
+            rendered = 0
+
+            def render_contents(self, resources, streams, ctm=MATRIX_IDENTITY):
+                CountingInterpreter.rendered += 1
+                return PDFPageInterpreter.render_contents(self, resources, streams, ctm=ctm)
+        data = self.make_form_page()
+        (layout, _) = self.render(data, interpreter=CountingInterpreter)
+        self.assertEqual(CountingInterpreter.rendered, 3)
+        CountingInterpreter.rendered = 0
+        (layout1, _) = self.render(data, device=FigureCachingAggregator,
+                                   interpreter=CountingInterpreter)
+        self.assertEqual(CountingInterpreter.rendered, 2)
+        self.assertEqual(layout, layout1)
+        # not with another scaling.
+        data = data.replace(b'1 0 0 1 300 400 cm', b'2 0 0 2 300 400 cm')
+        (layout, _) = self.render(data)
+        CountingInterpreter.rendered = 0
+        (layout1, _) = self.render(data, device=FigureCachingAggregator,
+                                   interpreter=CountingInterpreter)
+        self.assertEqual(CountingInterpreter.rendered, 3)
+        self.assertEqual(layout, layout1)
+        # nor in another state.
+        for op in (b'3 w', b'2 Tc', b'5 Ts'):
+            data = self.make_form_page(self.FORM_PAGE.replace(b'Q q', b'Q q %s' % op))
+            CountingInterpreter.rendered = 0
+            self.render(data, device=FigureCachingAggregator, interpreter=CountingInterpreter)
+            self.assertEqual(CountingInterpreter.rendered, 3, op)
+        return
+
+    def test_3(self):
+        # missing fonts, color spaces and xobjects only matter when they are used.
+        data = self.make_page(
+            b'BT /F1 12 Tf 10 10 Td (Hi) Tj ET '
+            b'/CS1 cs 0.5 sc 0 0 10 10 re f /CS9 cs 0.5 sc 20 0 10 10 re f '
+            b'/CS2 cs 0 1 0 sc 40 0 10 10 re f /X1 Do /X2 Do',
+            b'<< /Font << /F1 5 0 R /F2 99 0 R >> '
+            b'/ColorSpace << /CS1 98 0 R /CS2 /DeviceRGB /CS3 97 0 R >> '
+            b'/XObject << /X1 96 0 R /X2 6 0 R /X3 95 0 R >> >>',
+            [self.FONT, self.make_stream(b'/Type /XObject /Subtype /Form /BBox [0 0 10 10]',
+                                         b'0 0 10 10 re f')])
+        (layout, interp) = self.render(data)
+        self.assertEqual([item[0] for item in layout[2]],
+                         ['LTTextBoxHorizontal', 'LTRect', 'LTRect', 'LTRect', 'LTFigure'])
+        line = layout[2][0][2][0]
+        self.assertEqual([item[-1] for item in line[2]], [u'H', u'i', u'\n'])
+        self.assertEqual(interp.graphicstate.ncolor.cs.name, 'DeviceRGB')
+        self.assertEqual(interp.graphicstate.ncolor.clr, [0, 1, 0])
+        # the unused ones are not even looked up.
+        self.assertEqual(sorted(interp.fontmap.specs), ['F2'])
+        self.assertEqual(sorted(interp.csmap.specs), ['CS3'])
+        self.assertEqual(sorted(interp.xobjmap.specs), ['X3'])
+        return
+
+    def test_4(self):
+        # a device that only draws text still follows cm, q and Q.
+        from .converter import PDFPageAggregator
+
+        class TextAggregator(PDFPageAggregator):
+            capabilities = ('text',)
+        data = self.make_page(
+            b'q 2 0 0 2 0 0 cm 1 0 0 RG 5 w BT /F1 12 Tf 10 10 Td (A) Tj ET Q '
+            b'0 0 m 100 100 l S BT /F1 12 Tf 10 300 Td (B) Tj ET '
+            b'q 1 0 0 1 50 0 cm 0 0 10 10 re f q 1 0 0 1 0 200 cm '
+            b'BT /F1 12 Tf 100 100 Td (C) Tj ET Q BT /F1 12 Tf 100 100 Td (D) Tj ET Q',
+            b'<< /Font << /F1 5 0 R >> >>', [self.FONT])
+        (layout, interp) = self.render(data)
+        (layout1, interp1) = self.render(data, device=TextAggregator)
+        graphics = [item for item in layout[2] if item[0] != 'LTTextBoxHorizontal']
+        self.assertEqual([item[0] for item in graphics], ['LTCurve', 'LTRect'])
+        texts = [item for item in layout[2] if item[0] == 'LTTextBoxHorizontal']
+        self.assertEqual(sorted(item[1][0] for item in texts), [10, 20, 150, 150])
+        self.assertEqual(layout1[2], texts)
+        self.assertEqual(interp1.ctm, interp.ctm)
+        self.assertEqual(interp1.gstack, [])
+        self.assertEqual(interp.graphicstate.linewidth, 0)
+        return
+
+    def test_5(self):
+        # the streams of /Contents are separated as if by whitespace.
+        streams = [PDFStream({}, b'BT /F1 12 Tf 10 10 Td (A) Tj ET'),
+                   PDFStream({}, b''),
+                   PDFStream({}, b'BT /F1 12 Tf 10 50 Td (B) Tj ET')]
+        objs = [obj for (_, obj) in PDFContentParser(streams).iterobjects()]
+        self.assertEqual(objs[9:12], [KWD(b'ET'), KWD(b'BT'), LIT('F1')])
+        self.assertEqual(objs[-1], KWD(b'ET'))
+        data = self.make_page(b'BT /F1 12 Tf 10 10 Td (A) Tj ET', b'<< /Font << /F1 5 0 R >> >>', [
+            self.FONT,
+            self.make_stream(b'', b'BT /F1 12 Tf 10 50 Td (B) Tj ET'),
+        ], contentsref=b'[4 0 R 6 0 R]')
+        (layout, _) = self.render(data)
+        self.assertEqual([item[1][:2] for item in layout[2]], [(10, 47.516), (10, 7.516)])
+        return
+
+if __name__ == '__main__':
+    unittest.main()
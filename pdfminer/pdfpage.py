@@ -112,20 +112,63 @@ class PDFPage(object):
                         pass
         return
 
+    @classmethod
+    def get_page(klass, document, pageno):
+        """Returns a page without walking the page tree, or None.
+
+        This works only for linearized documents (PDFDocument.find_page).
+        Inherited attributes are taken from the parents of the page.
+        """
+        objid = document.find_page(pageno)
+        if objid is None:
+            return None
+        try:
+            tree = dict_value(document.getobj(objid)).copy()
+        except PDFObjectNotFound:
+            return None
+        if tree.get('Type') is not LITERAL_PAGE:
+            return None
+        parent = tree.get('Parent')
+        # a broken tree might have a loop.
+        for _ in xrange(256):
+            if parent is None:
+                break
+            parent = dict_value(parent)
+            for k in klass.INHERITABLE_ATTRS:
+                if k in parent and k not in tree:
+                    tree[k] = parent[k]
+            parent = parent.get('Parent')
+        return klass(document, objid, tree)
+
     @classmethod
     def get_pages(klass, fp,
                   pagenos=None, maxpages=0, password=b'',
-                  caching=True, check_extractable=True):
+                  caching=True, check_extractable=True, parsecache=None):
         # Create a PDF parser object associated with the file object.
         parser = PDFParser(fp)
         # Create a PDF document object that stores the document structure.
-        doc = PDFDocument(parser, password=password, caching=caching)
+        # Only the needed parts of a linearized file are read
+        # when specific pages are requested.
+        doc = PDFDocument(parser, password=password, caching=caching,
+                          parsecache=parsecache, linearized=bool(pagenos))
         # Check if the document allows text extraction. If not, abort.
         if check_extractable and not doc.is_extractable:
             raise PDFTextExtractionNotAllowed('Text extraction is not allowed: %r' % fp)
+        done = set()
+        if pagenos and doc.linearized is not None:
+            for pageno in sorted(pagenos):
+                page = klass.get_page(doc, pageno)
+                if page is None:
+                    break
+                yield page
+                done.add(pageno)
+                if maxpages and maxpages <= pageno+1:
+                    return
+            else:
+                return
         # Process each page contained in the document.
         for (pageno, page) in enumerate(klass.create_pages(doc)):
-            if pagenos and (pageno not in pagenos):
+            if pagenos and (pageno not in pagenos or pageno in done):
                 continue
             yield page
             if maxpages and maxpages <= pageno+1:
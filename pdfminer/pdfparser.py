@@ -1,6 +1,6 @@
 #!/usr/bin/env python
+import re
 import logging
-from io import BytesIO
 from .psparser import PSStackParser
 from .psparser import PSSyntaxError
 from .psparser import PSEOF
@@ -37,6 +37,15 @@ class PDFParser(PSStackParser):
       parser.seek(offset)
       parser.nextobject()
 
+    A large file can also be parsed through a memory map,
+    which avoids re-reading the file every time the parser seeks:
+      m = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+      parser = PDFParser(m)
+
+    The data of stream objects is not read until it is used.
+    It is read from the parser's input, so the input must be kept
+    open (or mapped) as long as the objects are used.
+
     """
 
     def __init__(self, fp):
@@ -57,6 +66,26 @@ class PDFParser(PSStackParser):
     KEYWORD_XREF = KWD(b'xref')
     KEYWORD_STARTXREF = KWD(b'startxref')
 
+    ENDSTREAM = re.compile(br'\s*(endstream)')
+    ENDSTREAM_WINDOW = 65536
+
+    def find_endstream(self, pos):
+        """Returns the position of the first `endstream' after pos.
+
+        Returns -1 if it is not found.
+        """
+        if self.mapped and hasattr(self.fp, 'find'):
+            return self.fp.find(b'endstream', pos)
+        while 1:
+            data = self.read(pos, self.ENDSTREAM_WINDOW)
+            i = data.find(b'endstream')
+            if 0 <= i:
+                return pos+i
+            if len(data) < self.ENDSTREAM_WINDOW:
+                return -1
+            # the keyword might be cut at the end of the window.
+            pos += len(data)-8
+
     def do_keyword(self, pos, token):
         """Handles PDF-related keywords."""
 
@@ -99,31 +128,37 @@ class PDFParser(PSStackParser):
                     raise PDFSyntaxError('Unexpected EOF')
                 return
             pos += len(line)
-            self.fp.seek(pos)
-            data = self.fp.read(objlen)
-            self.seek(pos+objlen)
-            while 1:
-                try:
-                    (linepos, line) = self.nextline()
-                except PSEOF:
+            datalen = objlen
+            # trust /Length if endstream follows right after the data.
+            m = self.ENDSTREAM.match(self.read(pos+objlen, 64))
+            if m:
+                objlen += m.start(1)
+            else:
+                # /Length is wrong or missing: the data ends at
+                # the first endstream after the stream keyword.
+                i = self.find_endstream(pos)
+                if i < 0:
                     if STRICT:
                         raise PDFSyntaxError('Unexpected EOF')
-                    break
-                if b'endstream' in line:
-                    i = line.index(b'endstream')
-                    objlen += i
-                    if self.fallback:
-                        data += line[:i]
-                    break
-                objlen += len(line)
-                if self.fallback:
-                    data += line
+                    i = self.getsize()
+                objlen = i-pos
+                # the end-of-line marker before endstream is not data.
+                datalen = objlen
+                eol = self.read(max(pos, i-2), min(2, objlen))
+                if eol.endswith(b'\r\n'):
+                    datalen -= 2
+                elif eol.endswith((b'\r', b'\n')):
+                    datalen -= 1
             self.seek(pos+objlen)
             # XXX limit objlen not to exceed object boundary
+            if self.fallback:
+                # the data ends at endstream.
+                datalen = objlen
             if self.debug:
-                logging.debug('Stream: pos=%d, objlen=%d, dic=%r, data=%r...' % \
-                              (pos, objlen, dic, data[:10]))
-            obj = PDFStream(dic, data, self.doc.decipher)
+                logging.debug('Stream: pos=%d, objlen=%d, dic=%r' % \
+                              (pos, objlen, dic))
+            # the data is read when it is used.
+            obj = PDFStream(dic, None, self.doc.decipher, source=(self, pos, datalen))
             self.push((pos, obj))
 
         else:
@@ -146,7 +181,7 @@ class PDFStreamParser(PDFParser):
     """
 
     def __init__(self, data):
-        PDFParser.__init__(self, BytesIO(data))
+        PDFParser.__init__(self, data)
         return
 
     def flush(self):
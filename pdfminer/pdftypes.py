@@ -1,15 +1,17 @@
 #!/usr/bin/env python
 import zlib
-from .lzw import lzwdecode
-from .ascii85 import ascii85decode
+from io import BytesIO
+from .lzw import iter_lzwdecode
+from .ascii85 import iter_ascii85decode
 from .ascii85 import asciihexdecode
-from .runlength import rldecode
+from .runlength import iter_rldecode
 from .ccitt import ccittfaxdecode
 from .psparser import PSException
 from .psparser import PSObject
 from .psparser import LIT
 from .psparser import STRICT
-from .utils import apply_png_predictor
+from .utils import iter_png_predictor
+from .utils import ChunkReader
 from .utils import isnumber
 
 
@@ -174,18 +176,57 @@ def stream_value(x):
     return x
 
 
+##  Stream filters
+##
+def iter_flatedecode(chunks):
+    """Decompresses zlib data given as an iterator of strings.
+
+    When the data is corrupted, the output decoded so far is kept.
+    """
+    d = zlib.decompressobj()
+    for data in chunks:
+        try:
+            yield d.decompress(data)
+        except zlib.error as e:
+            if STRICT:
+                raise PDFException('Invalid zlib bytes: %r' % e)
+            return
+    yield d.flush()
+    return
+
+
+def iter_chunks(data, bufsiz):
+    for i in xrange(0, len(data), bufsiz):
+        yield data[i:i+bufsiz]
+    return
+
+
 ##  PDFStream type
 ##
 class PDFStream(PDFObject):
 
-    def __init__(self, attrs, rawdata, decipher=None):
+    """A PDF stream object.
+
+    The raw data is either given as a string, or read lazily from
+    `source', a tuple (reader, pos, length) where reader is an object
+    that has a read(pos, n) method, e.g. a PDFParser.
+    """
+
+    def __init__(self, attrs, rawdata, decipher=None, source=None):
         assert isinstance(attrs, dict)
+        assert rawdata is not None or source is not None
         self.attrs = attrs
         self.rawdata = rawdata
+        self.source = source
+        if rawdata is not None:
+            self.rawlen = len(rawdata)
+        else:
+            self.rawlen = source[2]
         self.decipher = decipher
         self.data = None
         self.objid = None
         self.genno = None
+        self.cache = None
         return
 
     def set_objid(self, objid, genno):
@@ -195,8 +236,7 @@ class PDFStream(PDFObject):
 
     def __repr__(self):
         if self.data is None:
-            assert self.rawdata is not None
-            return '<PDFStream(%r): raw=%d, %r>' % (self.objid, len(self.rawdata), self.attrs)
+            return '<PDFStream(%r): raw=%d, %r>' % (self.objid, self.rawlen, self.attrs)
         else:
             assert self.data is not None
             return '<PDFStream(%r): len=%d, %r>' % (self.objid, len(self.data), self.attrs)
@@ -231,35 +271,56 @@ class PDFStream(PDFObject):
         return zip(filters, params)
 
     def decode(self):
-        assert self.data is None and self.rawdata is not None
-        data = self.rawdata
+        """Decodes the data and returns it.
+
+        The data may not be kept if the cache has no room for it.
+        """
+        assert self.data is None
+        data = None
+        if self.cache is not None:
+            data = self.cache.get_data(self)
+        if data is not None:
+            pass
+        elif not self.get_filters() and not self.decipher:
+            data = self.get_rawdata()
+        else:
+            data = b''.join(self._iter_decode(65536))
+        self.set_data(data)
+        return data
+
+    def iter_data(self, bufsiz=65536):
+        """Yields the decoded data in chunks.
+
+        The filters are chained so that the whole decoded data is
+        never held in memory at once. The chunks are not cached.
+        """
+        data = self.data
+        if data is None and self.cache is not None:
+            data = self.cache.get_data(self)
+        if data is not None:
+            return iter([data])
+        return self._iter_decode(bufsiz)
+
+    def _iter_decode(self, bufsiz):
+        data = self.get_rawdata()
         if self.decipher:
             # Handle encryption
             data = self.decipher(self.objid, self.genno, data, self.attrs)
-        filters = self.get_filters()
-        if not filters:
-            self.data = data
-            self.rawdata = None
-            return
-        for (f,params) in filters:
+        chunks = iter_chunks(data, bufsiz)
+        for (f,params) in self.get_filters():
             if f in LITERALS_FLATE_DECODE:
                 # will get errors if the document is encrypted.
-                try:
-                    data = zlib.decompress(data)
-                except zlib.error as e:
-                    if STRICT:
-                        raise PDFException('Invalid zlib bytes: %r, %r' % (e, data))
-                    data = b''
+                chunks = iter_flatedecode(chunks)
             elif f in LITERALS_LZW_DECODE:
-                data = lzwdecode(data)
+                chunks = iter_lzwdecode(chunks, bufsiz)
             elif f in LITERALS_ASCII85_DECODE:
-                data = ascii85decode(data)
+                chunks = iter_ascii85decode(chunks)
             elif f in LITERALS_ASCIIHEX_DECODE:
-                data = asciihexdecode(data)
+                chunks = [asciihexdecode(b''.join(chunks))]
             elif f in LITERALS_RUNLENGTH_DECODE:
-                data = rldecode(data)
+                chunks = iter_rldecode(chunks)
             elif f in LITERALS_CCITTFAX_DECODE:
-                data = ccittfaxdecode(data, params)
+                chunks = [ccittfaxdecode(b''.join(chunks), params)]
             elif f in LITERALS_DCT_DECODE:
                 # This is probably a JPG stream - it does not need to be decoded twice.
                 # Just return the stream to the user.
@@ -280,17 +341,51 @@ class PDFStream(PDFObject):
                     colors = int_value(params.get('Colors', 1))
                     columns = int_value(params.get('Columns', 1))
                     bitspercomponent = int_value(params.get('BitsPerComponent', 8))
-                    data = apply_png_predictor(pred, colors, columns, bitspercomponent, data)
+                    chunks = iter_png_predictor(pred, colors, columns, bitspercomponent, chunks)
                 else:
                     raise PDFNotImplementedError('Unsupported predictor: %r' % pred)
+        for data in chunks:
+            if data:
+                yield data
+        return
+
+    def open(self, window=65536):
+        """Returns a file object that reads the decoded data.
+
+        The reader can seek back by up to `window' bytes.
+        """
+        if self.data is not None:
+            return BytesIO(self.data)
+        return ChunkReader(self.iter_data(), window=window)
+
+    def set_data(self, data):
+        # rawdata is kept so that the decoded data can be released,
+        # unless it can be read again from the source.
         self.data = data
-        self.rawdata = None
+        if self.source is not None:
+            self.rawdata = None
+        if self.cache is not None:
+            self.cache.add_data(self)
+        return
+
+    def release(self):
+        """Drops the decoded data. It is decoded again when needed."""
+        self.data = None
+        if self.source is not None:
+            self.rawdata = None
         return
 
     def get_data(self):
-        if self.data is None:
-            self.decode()
-        return self.data
+        data = self.data
+        if data is None:
+            data = self.decode()
+        return data
 
     def get_rawdata(self):
-        return self.rawdata
+        if self.rawdata is not None:
+            return self.rawdata
+        (reader, pos, length) = self.source
+        data = reader.read(pos, length)
+        if self.data is None:
+            self.rawdata = data
+        return data
@@ -1,6 +1,11 @@
 #!/usr/bin/env python
 import re
+import sys
+import mmap
 import logging
+import weakref
+import threading
+from collections import deque
 from .utils import choplist
 
 STRICT = 0
@@ -92,21 +97,63 @@ class PSSymbolTable(object):
     """A utility class for storing PSLiteral/PSKeyword objects.
 
     Interned objects can be checked its identity with "is" operator.
+
+    Every symbol stays interned as long as something refers to it,
+    such as a module-level constant or a parsed object, so identity
+    checks keep working. Symbols nobody refers to are dropped, except
+    for the most recent ones (up to maxsize), which are kept around
+    to be reused. This bounds the memory used by one-off names.
+    intern() can be called from several threads at once.
     """
 
+    maxsize = 10000
+
     def __init__(self, klass):
-        self.dict = {}
+        self.dict = weakref.WeakValueDictionary()
+        self.recent = {}
         self.klass = klass
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
         return
 
+    def __len__(self):
+        return len(self.dict)
+
     def intern(self, name):
-        if name in self.dict:
-            lit = self.dict[name]
-        else:
-            lit = self.klass(name)
-            self.dict[name] = lit
+        try:
+            lit = self.recent[name]
+            self.hits += 1
+            return lit
+        except KeyError:
+            pass
+        with self.lock:
+            lit = self.dict.get(name)
+            if lit is None:
+                lit = self.klass(name)
+                self.dict[name] = lit
+                self.misses += 1
+            else:
+                self.hits += 1
+            if self.maxsize <= len(self.recent):
+                self.recent.clear()
+            self.recent[name] = lit
         return lit
 
+    def stats(self):
+        """Returns the table size and hit rate.
+
+        The counters are not locked, so they are approximate
+        while other threads are interning.
+        """
+        total = self.hits + self.misses
+        return {
+            'size': len(self.dict),
+            'recent': len(self.recent),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / total if total else 0.0,
+        }
+
 PSLiteralTable = PSSymbolTable(PSLiteral)
 PSKeywordTable = PSSymbolTable(PSKeyword)
 LIT = PSLiteralTable.intern
@@ -151,18 +198,131 @@ END_KEYWORD = re.compile(br'[#/%\[\]()<>{}\s]')
 END_STRING = re.compile(br'[()\134]')
 OCT_STRING = re.compile(br'[0-7]')
 ESC_STRING = {b'b': 8, b't': 9, b'n': 10, b'f': 12, b'r': 13, b'(': 40, b')': 41, b'\\': 92}
+LITERAL_HEX = re.compile(br'#([0-9a-fA-F]{0,2})')
+SCAN_TOKEN = re.compile(br'''
+\s*(?:%[^\r\n]*(?=[\r\n])\s*)*
+(?:
+  (?P<literal>/(?:[^#/%\[\]()<>{}\s]|\#[0-9a-fA-F]{0,2})*)
+| (?P<number>[-+0-9][0-9]*(?:\.[0-9]*)?|\.[0-9]*)
+| (?P<keyword>[A-Za-z][^#/%\[\]()<>{}\s]*)
+| (?P<string>\([^()\\]*\))
+| (?P<dictbegin><<)
+| (?P<hexstring><[0-9a-fA-F\s]*)
+| (?P<dictend>>>)
+| (?P<wclose>>)
+| (?P<char>[^\s(%])
+)?''', re.VERBOSE)
+# These tokens are delimited by the character that follows them,
+# so they cannot be taken as complete at the end of a buffer.
+SCAN_OPEN_ENDED = frozenset(['literal', 'number', 'keyword', 'hexstring', 'wclose'])
+SCAN_DELIMITERS = b'[]{}'
+
+
+def scan_tokens(s, i, bufpos, tokens):
+    """Tokenizes s from i with a single regular expression.
+
+    Complete tokens are appended to tokens as (pos, token) tuples.
+    Scanning stops after the first keyword (other than the array,
+    dictionary and procedure delimiters), or at whatever the regular
+    expression cannot decide by itself: a string with nested parentheses
+    or escapes, an unterminated comment, or a token that runs up to
+    the end of s. Returns the position where the scanning stopped,
+    from which the PSBaseParser state machine can take over.
+    """
+    n = len(s)
+    match = SCAN_TOKEN.match
+    while 1:
+        m = match(s, i)
+        kind = m.lastgroup
+        if kind is None:
+            return m.end()
+        j = m.end()
+        if j == n and kind in SCAN_OPEN_ENDED:
+            return m.start(kind)
+        pos = bufpos+m.start(kind)
+        i = j
+        if kind == 'number':
+            token = m.group(kind)
+            try:
+                if b'.' in token:
+                    tokens.append((pos, float(token)))
+                else:
+                    tokens.append((pos, int(token)))
+            except ValueError:
+                pass
+        elif kind == 'keyword':
+            token = m.group(kind)
+            if token == b'true':
+                tokens.append((pos, True))
+            elif token == b'false':
+                tokens.append((pos, False))
+            else:
+                tokens.append((pos, KWD(token)))
+                return i
+        elif kind == 'literal':
+            token = m.group(kind)[1:]
+            if b'#' in token:
+                token = LITERAL_HEX.sub(lambda x: chr(int(x.group(1), 16)) if x.group(1) else b'', token)
+            try:
+                # Try to interpret the token as a utf-8 string
+                token = token.decode('utf-8')
+            except UnicodeDecodeError:
+                # We failed, there is possibly a corrupt PDF here.
+                if STRICT: raise
+                token = ""
+            tokens.append((pos, LIT(token)))
+        elif kind == 'string':
+            tokens.append((pos, m.group(kind)[1:-1]))
+        elif kind == 'char':
+            token = m.group(kind)
+            tokens.append((pos, KWD(token)))
+            if token not in SCAN_DELIMITERS:
+                return i
+        elif kind == 'hexstring':
+            token = HEX_PAIR.sub(lambda x: chr(int(x.group(0), 16)),
+                                 SPC.sub(b'', m.group(kind)[1:]))
+            tokens.append((pos, token))
+        elif kind == 'dictbegin':
+            tokens.append((pos, KEYWORD_DICT_BEGIN))
+        elif kind == 'dictend':
+            tokens.append((pos, KEYWORD_DICT_END))
+        # a lone '>' is ignored.
+    return i
+
+try:
+    from . import _psparser
+    _psparser.setup(sys.modules[__name__])
+except ImportError:
+    _psparser = None
 
 
 class PSBaseParser(object):
 
     """Most basic PostScript parser that performs only tokenization.
+
+    fp is normally a file object, which is read in BUFSIZ chunks.
+    It can also be a buffer object (an mmap.mmap, str or buffer).
+    In that case the whole input is used as the parser's buffer
+    and tokenized in place, so seek() merely moves the index.
+
+    Runs of simple tokens are tokenized in batches by scan_tokens,
+    which is the compiled _psparser.scan_tokens when it is available.
+    The _parse_* methods form a state machine that handles
+    everything else, such as tokens split across two buffers.
+    Setting scan_tokens to None leaves all the work to the state machine.
     """
     BUFSIZ = 4096
+    if _psparser is not None:
+        scan_tokens = staticmethod(_psparser.scan_tokens)
+    else:
+        scan_tokens = staticmethod(scan_tokens)
+    MAPPABLE_TYPES = (mmap.mmap, str, buffer)
 
     debug = 0
 
     def __init__(self, fp):
         self.fp = fp
+        self.mapped = isinstance(fp, self.MAPPABLE_TYPES)
         self.seek(0)
         return
 
@@ -180,34 +340,79 @@ class PSBaseParser(object):
         return self.bufpos+self.charpos
 
     def poll(self, pos=None, n=80):
-        pos0 = self.fp.tell()
         if not pos:
             pos = self.bufpos+self.charpos
+        if self.mapped:
+            logging.info('poll(%d): %r' % (pos, self.fp[pos:pos+n]))
+            return
+        pos0 = self.fp.tell()
         self.fp.seek(pos)
         logging.info('poll(%d): %r' % (pos, self.fp.read(n)))
         self.fp.seek(pos0)
         return
 
+    def getsize(self):
+        """Returns the size of the input in bytes."""
+        if self.mapped:
+            return len(self.fp)
+        pos0 = self.fp.tell()
+        self.fp.seek(0, 2)
+        size = self.fp.tell()
+        self.fp.seek(pos0)
+        return size
+
+    def read(self, pos, n):
+        """Reads n bytes at the given position.
+
+        This does not change the position of the parser.
+        """
+        if self.mapped:
+            return self.fp[pos:pos+n]
+        pos0 = self.fp.tell()
+        self.fp.seek(pos)
+        data = self.fp.read(n)
+        self.fp.seek(pos0)
+        return data
+
+    def getbuffer(self):
+        """Returns the whole input as a buffer object.
+
+        A file is memory-mapped if possible, otherwise read at once.
+        """
+        if self.mapped:
+            return self.fp
+        try:
+            return mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, IOError, ValueError, mmap.error):
+            return self.read(0, self.getsize())
+
     def seek(self, pos):
         """Seeks the parser to the given position.
         """
         if self.debug:
             logging.debug('seek: %r' % pos)
-        self.fp.seek(pos)
         # reset the status for nextline()
-        self.bufpos = pos
-        self.buf = b''
-        self.charpos = 0
+        if self.mapped:
+            self.bufpos = 0
+            self.buf = self.fp
+            self.charpos = pos
+        else:
+            self.fp.seek(pos)
+            self.bufpos = pos
+            self.buf = b''
+            self.charpos = 0
         # reset the status for nexttoken()
         self._parse1 = self._parse_main
         self._curtoken = b''
         self._curtokenpos = 0
-        self._tokens = []
+        self._tokens = deque()
         return
 
     def fillbuf(self):
         if self.charpos < len(self.buf):
             return
+        if self.mapped:
+            raise PSEOF('Unexpected EOF')
         # fetch next chunk.
         self.bufpos = self.fp.tell()
         self.buf = self.fp.read(self.BUFSIZ)
@@ -251,14 +456,20 @@ class PSBaseParser(object):
 
         This is used to locate the trailers at the end of a file.
         """
-        self.fp.seek(0, 2)
-        pos = self.fp.tell()
+        if self.mapped:
+            pos = len(self.fp)
+        else:
+            self.fp.seek(0, 2)
+            pos = self.fp.tell()
         buf = b''
         while 0 < pos:
             prevpos = pos
             pos = max(0, pos-self.BUFSIZ)
-            self.fp.seek(pos)
-            s = self.fp.read(prevpos-pos)
+            if self.mapped:
+                s = self.fp[pos:prevpos]
+            else:
+                self.fp.seek(pos)
+                s = self.fp.read(prevpos-pos)
             if not s:
                 break
             while 1:
@@ -496,9 +707,21 @@ class PSBaseParser(object):
 
     def nexttoken(self):
         while not self._tokens:
-            self.fillbuf()
+            try:
+                self.fillbuf()
+            except PSEOF:
+                # a token that runs up to the end of the data is complete.
+                if self._parse1 not in (self._parse_keyword, self._parse_number,
+                                        self._parse_float, self._parse_literal):
+                    raise
+                self._parse1(b' ', 0)
+                continue
+            if self.scan_tokens is not None and self._parse1 == self._parse_main:
+                self.charpos = self.scan_tokens(self.buf, self.charpos, self.bufpos, self._tokens)
+                if self._tokens:
+                    break
             self.charpos = self._parse1(self.buf, self.charpos)
-        token = self._tokens.pop(0)
+        token = self._tokens.popleft()
         if self.debug:
             logging.debug('nexttoken: %r' % (token,))
         return token
@@ -517,7 +740,7 @@ class PSStackParser(PSBaseParser):
         self.context = []
         self.curtype = None
         self.curstack = []
-        self.results = []
+        self.results = deque()
         return
 
     def seek(self, pos):
@@ -620,11 +843,29 @@ class PSStackParser(PSBaseParser):
                 continue
             else:
                 self.flush()
-        obj = self.results.pop(0)
+        obj = self.results.popleft()
         if self.debug:
             logging.debug('nextobject: %r' % (obj,))
         return obj
 
+    def iterobjects(self):
+        """Yields the remaining objects until the end of input.
+
+        Same as calling nextobject() until PSEOF, but the objects
+        that are already parsed are handed out in one go.
+        """
+        while 1:
+            try:
+                yield self.nextobject()
+            except PSEOF:
+                return
+            while self.results:
+                obj = self.results.popleft()
+                if self.debug:
+                    logging.debug('nextobject: %r' % (obj,))
+                yield obj
+        return
+
 
 import unittest
 
@@ -679,13 +920,18 @@ func/a/b{(c)do*}def
       (258, {'foo': 'bar'}),
     ]
 
-    def get_tokens(self, s):
+    def get_tokens(self, s, mapped=False, **attrs):
         from io import BytesIO
 
         class MyParser(PSBaseParser):
             def flush(self):
                 self.add_results(*self.popall())
-        parser = MyParser(BytesIO(s))
+        for (k, v) in attrs.iteritems():
+            setattr(MyParser, k, v)
+        if mapped:
+            parser = MyParser(s)
+        else:
+            parser = MyParser(BytesIO(s))
         r = []
         try:
             while 1:
@@ -694,13 +940,18 @@ func/a/b{(c)do*}def
             pass
         return r
 
-    def get_objects(self, s):
+    def get_objects(self, s, mapped=False, iterate=False):
         from io import BytesIO
 
         class MyParser(PSStackParser):
             def flush(self):
                 self.add_results(*self.popall())
-        parser = MyParser(BytesIO(s))
+        if mapped:
+            parser = MyParser(s)
+        else:
+            parser = MyParser(BytesIO(s))
+        if iterate:
+            return list(parser.iterobjects())
         r = []
         try:
             while 1:
@@ -721,5 +972,98 @@ func/a/b{(c)do*}def
         self.assertEqual(objs, self.OBJS)
         return
 
+    def test_3(self):
+        tokens = self.get_tokens(self.TESTDATA, mapped=True)
+        self.assertEqual(tokens, self.TOKENS)
+        objs = self.get_objects(self.TESTDATA, mapped=True)
+        self.assertEqual(objs, self.OBJS)
+        return
+
+    def test_4(self):
+        # tokens split at any buffer boundary, with or without scan_tokens.
+        for bufsiz in xrange(1, 40):
+            tokens = self.get_tokens(self.TESTDATA, BUFSIZ=bufsiz)
+            self.assertEqual(tokens, self.TOKENS)
+            tokens = self.get_tokens(self.TESTDATA, BUFSIZ=bufsiz, scan_tokens=None)
+            self.assertEqual(tokens, self.TOKENS)
+            tokens = self.get_tokens(self.TESTDATA, BUFSIZ=bufsiz, scan_tokens=staticmethod(scan_tokens))
+            self.assertEqual(tokens, self.TOKENS)
+        return
+
+    def test_5(self):
+        # the compiled and pure-Python scan_tokens agree on real files.
+        import os.path
+        import glob
+        if _psparser is None:
+            self.skipTest('_psparser is not built')
+        # numbers around the size of a C long.
+        data = b'123456789 -123456789 1234567890 -2147483649 12345678901234567890 +7 -0 '
+        expected = self.get_tokens(data, scan_tokens=staticmethod(scan_tokens))
+        tokens = self.get_tokens(data, scan_tokens=staticmethod(_psparser.scan_tokens))
+        self.assertEqual(tokens, expected)
+        samples = os.path.join(os.path.dirname(__file__), '..', 'samples')
+        fnames = sorted(glob.glob(os.path.join(samples, '*.pdf')))
+        if not fnames:
+            self.skipTest('no samples')
+        for fname in fnames:
+            with open(fname, 'rb') as fp:
+                data = fp.read()
+            for bufsiz in (4096, len(data)):
+                expected = self.get_tokens(data, BUFSIZ=bufsiz, scan_tokens=staticmethod(scan_tokens))
+                tokens = self.get_tokens(data, BUFSIZ=bufsiz, scan_tokens=staticmethod(_psparser.scan_tokens))
+                self.assertEqual(tokens, expected, fname)
+                tokens = self.get_tokens(data, BUFSIZ=bufsiz, scan_tokens=None)
+                self.assertEqual(tokens, expected, fname)
+        return
+
+    def test_6(self):
+        objs = self.get_objects(self.TESTDATA, iterate=True)
+        self.assertEqual(objs, self.OBJS)
+        # a long TJ array comes out as a single object.
+        objs = self.get_objects(b'[' + b' 1 (a)' * 100000 + b'] TJ', iterate=True)
+        self.assertEqual(len(objs), 1)
+        self.assertEqual(len(objs[0][1]), 200000)
+        return
+
+    def test_7(self):
+        table = PSSymbolTable(PSLiteral)
+        table.maxsize = 2
+        a = table.intern('a')
+        for name in ('b', 'c', 'd'):
+            table.intern(name)
+        # a is still referred to, so it keeps its identity.
+        self.assertTrue(table.intern('a') is a)
+        self.assertTrue(table.intern(u'a') is a)
+        # the other symbols are gone once the cache is cleared.
+        self.assertEqual(len(table), 1)
+        stats = table.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 4))
+        return
+
+    def test_8(self):
+        from io import BytesIO
+        for parser in (PSBaseParser(BytesIO(self.TESTDATA)), PSBaseParser(self.TESTDATA)):
+            parser.nexttoken()
+            self.assertEqual(parser.getsize(), len(self.TESTDATA))
+            self.assertEqual(parser.read(16, 3), b'"  ')
+            self.assertEqual(parser.read(len(self.TESTDATA)-3, 10), b'>>\n')
+            # reading does not disturb the tokenizer.
+            self.assertEqual(parser.nexttoken(), (11, KWD(b'end')))
+        return
+
+    def test_9(self):
+        # the last token is kept when the data ends right after it.
+        scans = [None, staticmethod(scan_tokens)]
+        if _psparser is not None:
+            scans.append(staticmethod(_psparser.scan_tokens))
+        for (data, token) in ((b'0 0 10 10 re f', KWD(b'f')), (b'/F1 12', 12),
+                              (b'1 0.5', 0.5), (b'/F1', LIT('F1'))):
+            for scan in scans:
+                for (mapped, bufsiz) in ((False, 1), (False, 4096), (True, 4096)):
+                    tokens = self.get_tokens(data, mapped=mapped, BUFSIZ=bufsiz, scan_tokens=scan)
+                    self.assertEqual(tokens[-1][1], token, data)
+        self.assertEqual(self.get_tokens(b'1 -'), [(0, 1)])
+        return
+
 if __name__ == '__main__':
     unittest.main()
@@ -23,26 +23,47 @@ def rldecode(data):
     >>> rldecode(s)
     '1234567777777abcde'
     """
-    decoded = []
-    i = 0
-    while i < len(data):
-        #print 'data[%d]=:%d:' % (i,ord(data[i]))
-        length = ord(data[i])
-        if length == 128:
-            break
-        if length >= 0 and length < 128:
-            run = data[i+1:(i+1)+(length+1)]
-            #print 'length=%d, run=%s' % (length+1,run)
-            decoded.append(run)
-            i = (i+1) + (length+1)
-        if length > 128:
-            run = data[i+1]*(257-length)
-            #print 'length=%d, run=%s' % (257-length,run)
-            decoded.append(run)
-            i = (i+1) + 1
-    return b''.join(decoded)
+    return b''.join(iter_rldecode([data]))
 
 
+def iter_rldecode(chunks):
+    """Decodes RunLength data given as an iterator of strings.
+
+    The decoded data is yielded as it goes. A run split between
+    two strings is decoded once it is complete.
+    """
+    buf = b''
+    for data in chunks:
+        buf += data
+        n = len(buf)
+        decoded = []
+        i = 0
+        while i < n:
+            length = ord(buf[i])
+            if length == 128:
+                yield b''.join(decoded)
+                return
+            if length < 128:
+                if n < i+length+2:
+                    break
+                decoded.append(buf[i+1:i+length+2])
+                i += length+2
+            else:
+                if n < i+2:
+                    break
+                decoded.append(buf[i+1]*(257-length))
+                i += 2
+        buf = buf[i:]
+        yield b''.join(decoded)
+    if buf:
+        # a truncated run at the end.
+        length = ord(buf[0])
+        if length < 128:
+            yield buf[1:]
+        else:
+            yield buf[1]*(257-length)
+    return
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -2,6 +2,8 @@
 """
 Miscellaneous Routines.
 """
+import sys
+import array
 import struct
 from sys import maxint as INF
 
@@ -9,44 +11,121 @@ from sys import maxint as INF
 ##  PNG Predictor
 ##
 def apply_png_predictor(pred, colors, columns, bitspercomponent, data):
+    return b''.join(iter_png_predictor(pred, colors, columns, bitspercomponent, [data]))
+
+
+def iter_png_predictor(pred, colors, columns, bitspercomponent, chunks):
+    """Applies a PNG predictor to an iterator of strings.
+
+    The data is yielded row by row as soon as each row is complete.
+    """
     if bitspercomponent != 8:
         # unsupported
         raise ValueError("Unsupported `bitspercomponent': %d"%bitspercomponent)
     nbytes = colors*columns*bitspercomponent//8
-    i = 0
-    buf = b''
     line0 = b'\x00' * columns
-    for i in xrange(0, len(data), nbytes+1):
-        ft = data[i]
-        i += 1
-        line1 = data[i:i+nbytes]
-        line2 = b''
-        if ft == b'\x00':
-            # PNG none
-            line2 += line1
-        elif ft == b'\x01':
-            # PNG sub (UNTESTED)
-            c = 0
-            for b in line1:
-                c = (c+ord(b)) & 255
-                line2 += chr(c)
-        elif ft == b'\x02':
-            # PNG up
-            for (a, b) in zip(line0, line1):
-                c = (ord(a)+ord(b)) & 255
-                line2 += chr(c)
-        elif ft == b'\x03':
-            # PNG average (UNTESTED)
-            c = 0
-            for (a, b) in zip(line0, line1):
-                c = ((c+ord(a)+ord(b))//2) & 255
-                line2 += chr(c)
-        else:
-            # unsupported
-            raise ValueError("Unsupported predictor value: %d"%ft)
-        buf += line2
-        line0 = line2
-    return buf
+    buf = b''
+    for data in chunks:
+        buf += data
+        n = len(buf) - len(buf) % (nbytes+1)
+        for i in xrange(0, n, nbytes+1):
+            line0 = _png_predict_line(buf[i], line0, buf[i+1:i+1+nbytes])
+            yield line0
+        buf = buf[n:]
+    if buf:
+        # the last row is incomplete.
+        yield _png_predict_line(buf[0], line0, buf[1:])
+    return
+
+
+def _png_predict_line(ft, line0, line1):
+    line2 = b''
+    if ft == b'\x00':
+        # PNG none
+        line2 += line1
+    elif ft == b'\x01':
+        # PNG sub (UNTESTED)
+        c = 0
+        for b in line1:
+            c = (c+ord(b)) & 255
+            line2 += chr(c)
+    elif ft == b'\x02':
+        # PNG up
+        for (a, b) in zip(line0, line1):
+            c = (ord(a)+ord(b)) & 255
+            line2 += chr(c)
+    elif ft == b'\x03':
+        # PNG average (UNTESTED)
+        c = 0
+        for (a, b) in zip(line0, line1):
+            c = ((c+ord(a)+ord(b))//2) & 255
+            line2 += chr(c)
+    else:
+        # unsupported
+        raise ValueError("Unsupported predictor value: %d"%ord(ft))
+    return line2
+
+
+##  ChunkReader
+##
+class ChunkReader(object):
+
+    """A read-only file object over an iterator of strings.
+
+    Only the chunks that are being read are held in memory, plus
+    at most `window' bytes before the current position so that
+    the reader can seek back a little.
+    """
+
+    def __init__(self, chunks, window=0):
+        self.chunks = iter(chunks)
+        self.window = window
+        self.buf = b''
+        self.bufpos = 0
+        self.pos = 0
+        return
+
+    def _fill(self, end):
+        while len(self.buf) < end-self.bufpos:
+            try:
+                data = next(self.chunks)
+            except StopIteration:
+                break
+            # discard the data that is out of the window.
+            keep = min(max(self.bufpos, self.pos-self.window),
+                       self.bufpos+len(self.buf))
+            self.buf = self.buf[keep-self.bufpos:] + data
+            self.bufpos = keep
+        return
+
+    def read(self, n=-1):
+        if n < 0:
+            data = self.buf[self.pos-self.bufpos:] + b''.join(self.chunks)
+            self.buf = b''
+            self.pos = self.bufpos = self.pos+len(data)
+            return data
+        self._fill(self.pos+n)
+        i = self.pos-self.bufpos
+        data = self.buf[i:i+n]
+        self.pos += len(data)
+        return data
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence != 0:
+            raise IOError('Unsupported whence: %r' % whence)
+        if pos < self.bufpos:
+            raise IOError('Cannot seek back to %d' % pos)
+        self.pos = pos
+        return
+
+    def close(self):
+        self.buf = b''
+        return
 
 
 ##  Matrix operations
@@ -183,6 +262,46 @@ def nunpack(s, default=0):
         raise TypeError('invalid length: %d' % l)
 
 
+# nunpack_array
+UINT32 = 'I' if array.array('I').itemsize == 4 else 'L'
+
+def nunpack_array(data, offset, width, stride, n):
+    """Unpacks n big endian integers (1 to 4 bytes) at once.
+
+    The integers are width bytes long and placed every stride bytes
+    from offset, as the fields of a fixed-size record table are.
+    Returns an array of unsigned 32-bit integers.
+    """
+    if not 1 <= width <= 4:
+        raise TypeError('invalid length: %d' % width)
+    buf = bytearray(n*4)
+    for i in xrange(width):
+        j = offset+i
+        buf[4-width+i::4] = data[j:j+stride*(n-1)+1:stride]
+    a = array.array(UINT32)
+    a.fromstring(bytes(buf))
+    if sys.byteorder == 'little':
+        a.byteswap()
+    return a
+
+
+# unpack_bits
+def unpack_bits(data, pos, width, n):
+    """Unpacks n unsigned integers of width bits each.
+
+    The integers are packed one after another (most significant bit
+    first) from bit position pos, as in PDF hint tables.
+    """
+    r = []
+    for _ in xrange(n):
+        x = 0
+        for _ in xrange(width):
+            x = (x << 1) | ((ord(data[pos >> 3]) >> (7 - (pos & 7))) & 1)
+            pos += 1
+        r.append(x)
+    return r
+
+
 # decode_text
 PDFDocEncoding = ''.join(unichr(x) for x in (
     0x0000, 0x0001, 0x0002, 0x0003, 0x0004, 0x0005, 0x0006, 0x0007,
@@ -1,5 +1,5 @@
 #!/usr/bin/env python
-from distutils.core import setup
+from distutils.core import setup, Extension
 from pdfminer import __version__
 
 setup(
@@ -24,6 +24,10 @@ PDF parser that can be used for other purposes instead of text analysis.''',
     packages=[
     'pdfminer',
     ],
+    ext_modules=[
+    # optional: psparser falls back to pure Python without it.
+    Extension('pdfminer._psparser', ['pdfminer/_psparser.c'], optional=True),
+    ],
     package_data={
     'pdfminer': ['cmap/*.pickle.gz']
     },
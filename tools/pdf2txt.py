@@ -2,6 +2,7 @@
 import sys
 from pdfminer.pdfdocument import PDFDocument
 from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfcache import PDFParseCache
 from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
 from pdfminer.pdfdevice import PDFDevice, TagExtractor
 from pdfminer.pdfpage import PDFPage
@@ -15,13 +16,13 @@ def main(argv):
     import getopt
     def usage():
         print ('usage: %s [-d] [-p pagenos] [-m maxpages] [-P password] [-o output]'
-               ' [-C] [-n] [-A] [-V] [-M char_margin] [-L line_margin] [-W word_margin]'
+               ' [-C] [-K cachedir] [-n] [-A] [-V] [-M char_margin] [-L line_margin] [-W word_margin]'
                ' [-F boxes_flow] [-Y layout_mode] [-O output_dir] [-R rotation] [-S]'
                ' [-t text|html|xml|tag] [-c codec] [-s scale]'
                ' file ...' % argv[0])
         return 100
     try:
-        (opts, args) = getopt.getopt(argv[1:], 'dp:m:P:o:CnAVM:L:W:F:Y:O:R:St:c:s:')
+        (opts, args) = getopt.getopt(argv[1:], 'dp:m:P:o:CK:nAVM:L:W:F:Y:O:R:St:c:s:')
     except getopt.GetoptError:
         return usage()
     if not args: return usage()
@@ -42,6 +43,7 @@ def main(argv):
     pageno = 1
     scale = 1
     caching = True
+    parsecache = None
     showpageno = True
     laparams = LAParams()
     for (k, v) in opts:
@@ -51,6 +53,7 @@ def main(argv):
         elif k == '-P': password = v
         elif k == '-o': outfile = v
         elif k == '-C': caching = False
+        elif k == '-K': parsecache = PDFParseCache(v)
         elif k == '-n': laparams = None
         elif k == '-A': laparams.all_texts = True
         elif k == '-V': laparams.detect_vertical = True
@@ -71,7 +74,7 @@ def main(argv):
     CMapDB.debug = debug
     PDFPageInterpreter.debug = debug
     #
-    rsrcmgr = PDFResourceManager(caching=caching)
+    rsrcmgr = PDFResourceManager(caching=caching, parsecache=parsecache)
     if not outtype:
         outtype = 'text'
         if outfile:
@@ -105,7 +108,8 @@ def main(argv):
         interpreter = PDFPageInterpreter(rsrcmgr, device)
         for page in PDFPage.get_pages(fp, pagenos,
                                       maxpages=maxpages, password=password,
-                                      caching=caching, check_extractable=True):
+                                      caching=caching, check_extractable=True,
+                                      parsecache=parsecache):
             page.rotate = (page.rotate+rotation) % 360
             interpreter.process_page(page)
         fp.close()